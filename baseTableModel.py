@@ -58,7 +58,35 @@ class BaseTaBleModel(QAbstractTableModel):
         return True
 
     def prepare(self):
-        self.removeRows(0, self.rowCount())
+        self.set_rows([])
+
+    def __fill(self, rows):
+        # Short rows are padded with None up to the number of columns
+        columns = self.columnCount()
+        return [list(row) + [None] * (columns - len(row)) for row in rows]
+
+    def set_rows(self, rows):
+        """
+        Replaces all rows of the model at once.
+        :param rows: iterable of sequences of cell values
+        """
+        self.beginResetModel()
+        self.items = self.__fill(rows)
+        self.endResetModel()
+
+    def extend_rows(self, rows):
+        """
+        Appends rows to the end of the model at once.
+        :param rows: iterable of sequences of cell values
+        """
+        rows = self.__fill(rows)
+        if not rows:
+            return
+
+        position = len(self.items)
+        self.beginInsertRows(QModelIndex(), position, position + len(rows) - 1)
+        self.items.extend(rows)
+        self.endInsertRows()
 
     def add_row(self, *args):
         self.insertRows(0, 1)
@@ -67,4 +95,55 @@ class BaseTaBleModel(QAbstractTableModel):
 
     def update_row(self, row, *args):
         for i, arg in enumerate(args):
-            self.setData(self.index(row, i), arg)
\ No newline at end of file
+            self.setData(self.index(row, i), arg)
+
+
+class PagedTableModel(BaseTaBleModel):
+    """
+    Model that loads the rows page by page when the view asks for more.
+    Source of rows sorts them itself, the last row loaded is the key the
+    next page starts after. Rows may keep hidden values after the columns
+    the source needs to continue.
+    """
+
+    def __init__(self, headers, page_size=200):
+        super(PagedTableModel, self).__init__(headers)
+
+        self.page_size = page_size
+        self.source = None
+        self.exhausted = True
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+
+    def set_source(self, source):
+        """
+        Drops the rows and loads the first page from the new source.
+        :param source: function(column, descending, after, limit) that
+        returns the list of rows, or None to clear the model
+        """
+        self.source = source
+        self.exhausted = source is None
+        self.set_rows([])
+        self.fetchMore()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        after = self.items[-1] if self.items else None
+        rows = self.source(self.sort_column,
+                           self.sort_order == Qt.DescendingOrder,
+                           after, self.page_size)
+        self.exhausted = len(rows) < self.page_size
+        self.extend_rows(rows)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.set_source(self.source)
+
+    def prepare(self):
+        self.set_source(None)
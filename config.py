@@ -7,6 +7,7 @@ log = "lt.log"
 dic_dir = "dics"
 corpus_dir = "corpus"
 output_dir = "output"
+cache_dir = "cache"
 
 input = {
     ".txt": ".html"
@@ -19,3 +20,14 @@ output = {
 dic = {
     ".txt"
 }
+
+tmp_ext = ".tmp"
+
+# Milliseconds the watcher waits for the burst of file events to end
+watcher_delay = 500
+
+# Fewer files are analyzed in the thread of worker without the pool
+pool_min_files = 4
+
+# Analyze new and modified corpus files as soon as they appear
+auto_analysis = False
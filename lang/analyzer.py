@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from multiprocessing import Pool
+
+import lang.printer as printer
+from lang.cache import file_digest
+
+_lexer = None  # Lexer of the worker process
+CANCEL_CHECK_TOKENS = 4096  # Number of tokens between checks of cancel flag
+
+
+class Canceled(Exception):
+    """ Analysis has been canceled in the middle of the file. """
+
+
+def _until_canceled(tokens, canceled):
+    for number, token in enumerate(tokens):
+        if number % CANCEL_CHECK_TOKENS == 0 and canceled():
+            raise Canceled()
+        yield token
+
+
+def _init_worker(lexer):
+    global _lexer
+    _lexer = lexer
+
+
+def _analyze_file(task):
+    return analyze_file(_lexer, task)
+
+
+def analyze_file(lexer, task, canceled=None):
+    """
+    Analyzes the file and writes marked text to the output path.
+    :param lexer:
+    :param task: file name, file path, output path and css
+    :param canceled: callable that tells if the analysis has been canceled,
+    it's called while the file is read
+    :return: file name, dic_unknown, text_size, known, maybe, digest of the
+    file; text_size is None if analysis has failed or has been canceled
+    """
+    file, file_path, out_path, css = task
+    logging.info("Analyze the file:" + file_path)
+    try:
+        digest = file_digest(file_path)
+        with open(file_path, 'r', encoding="utf-8") as i_file,\
+                open(out_path, 'w', encoding='utf-8') as a_file:
+            tokens = lexer.analyze_stream(i_file)
+            if canceled is not None:
+                tokens = _until_canceled(tokens, canceled)
+            printer.write_page(a_file, file, tokens, style=css)
+        dic_unknown, text_size, known, maybe = lexer.counters()
+        return file, dict(dic_unknown), text_size, known, maybe, digest
+    except Canceled:
+        logging.info("Analysis canceled:" + file_path)
+        return file, {}, None, 0, 0, ""
+    except Exception as e:
+        logging.exception(e)
+        return file, {}, None, 0, 0, ""
+
+
+class Analyzer:
+    """
+    Analyzes files in the pool of worker processes. The lexer is sent to
+    every worker once, when the worker starts.
+    """
+
+    def __init__(self, lexer, processes=None):
+        self.pool = Pool(processes, _init_worker,
+                         (lexer.copy_for_analysis(), ))
+
+    def imap(self, tasks):
+        """
+        Analyzes the files.
+        :param tasks: iterable of (file name, file path, output path, css)
+        :return: iterator of results in the order of tasks
+        """
+        return self.pool.imap(_analyze_file, tasks)
+
+    def close(self):
+        """
+        Waits for workers to finish.
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self):
+        """
+        Stops the workers immediately.
+        """
+        self.pool.terminate()
+        self.pool.join()
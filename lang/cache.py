@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+import hashlib
+import logging
+import pickle
+from lang.frozen import FrozenDictionary
+
+# Bump the version whenever the expansion rules of Lexer change, so the
+# dictionaries cached by the older code are never reused.
+CACHE_VERSION = 3
+
+
+def file_digest(path):
+    """
+    Calculates the hash of the file content.
+    :param path:
+    :return: hex digest or empty string if the file can't be read
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                digest.update(chunk)
+    except OSError as e:
+        logging.exception(e)
+        return ""
+
+    return digest.hexdigest()
+
+
+class DictionaryCache:
+    """
+    Keeps expanded dictionaries of the lexer on disk between runs.
+    The cache entry is valid as long as the content of the plugin and of
+    every dictionary file is the same as it was when entry has been saved.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def __entry_path(self, name, ext=".cache"):
+        file_name = hashlib.sha1("\0".join(name).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, file_name + ext)
+
+    def __read(self, name):
+        path = self.__entry_path(name)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as file:
+                return pickle.load(file)
+        except Exception as e:
+            logging.exception(e)
+            return None
+
+    def __write(self, name, entry):
+        path = self.__entry_path(name)
+        tmp_path = path + ".tmp"
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(tmp_path, 'wb') as file:
+                pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.exception(e)
+
+    def __freeze(self, lexer, name):
+        """
+        Replaces the dictionary of the lexer with the frozen one of its
+        generation, the one frozen before is mapped if it's there. Frozen
+        dictionaries of the other generations are removed unless they are
+        still in use. Lexer keeps its dictionary if it can't be frozen.
+        """
+        pattern = self.__entry_path(name, "-*.frozen")
+        path = self.__entry_path(name, "-{0}.frozen".format(lexer.generation))
+        try:
+            if os.path.exists(path):
+                frozen = FrozenDictionary.open(path)
+            else:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                frozen = FrozenDictionary.freeze(lexer.dic, path)
+        except Exception as e:
+            logging.exception(e)
+            return
+        lexer.freeze(frozen)
+
+        for old_path in glob.glob(pattern):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:  # Mapped by other process
+                    pass
+
+    @staticmethod
+    def plugin_key(plugin_path):
+        """
+        Calculates the part of the key that invalidates the whole entry.
+        :param plugin_path:
+        :return:
+        """
+        return "{0}:{1}".format(CACHE_VERSION, file_digest(plugin_path))
+
+    @staticmethod
+    def generation(plugin_key, digests):
+        """
+        Calculates the id of the dictionary built from given plugin and
+        dictionaries, it changes whenever any of them changes.
+        :param plugin_key:
+        :param digests: dict path -> digest of dictionary file
+        :return:
+        """
+        generation = hashlib.sha1(plugin_key.encode('utf-8'))
+        for path in sorted(digests):
+            generation.update("\0{0}\0{1}".format(path, digests[path])
+                              .encode('utf-8'))
+        return generation.hexdigest()
+
+    def build(self, lexer, name, plugin_path, dic_paths):
+        """
+        Fills the dictionary of the lexer with expanded words. Cached
+        dictionary is reused if the plugin has not changed since the last
+        build, only the dictionary files that were added, changed or removed
+        are loaded or unloaded and only new base words are expanded. The
+        lexer that has been built before with the same plugin is updated
+        the same way instead of the cached dictionary, the frozen one is
+        updated from the cache. The result is saved to the cache. Plugin
+        must be loaded into lexer beforehand. Lexer gets the generation of
+        its dictionary, the dictionary is frozen and memory-mapped, so it
+        takes little memory and every process that analyzes the files
+        shares it.
+        :param lexer:
+        :param name: tuple that identifies cache entry, e.g. (lang, project)
+        :param plugin_path:
+        :param dic_paths:
+        :return: True if the dictionary has been taken from cache unchanged
+        """
+        plugin_key = self.plugin_key(plugin_path)
+        digests = {path: file_digest(path) for path in dic_paths}
+        lexer.generation = self.generation(plugin_key, digests)
+
+        warm = lexer.plugin_key == plugin_key
+        frozen = isinstance(lexer.dic, FrozenDictionary)
+        if warm and frozen and digests and lexer.digests == digests:
+            logging.info("Dictionary cache hit:" + plugin_key)
+            return True
+
+        cached = {}
+        if warm and not frozen:  # Lexer is changed in place
+            cached = lexer.digests
+        else:
+            entry = self.__read(name)
+            if entry and entry.get("plugin") == plugin_key:
+                lexer.restore_dictionary(entry["state"])
+                cached = entry["digests"]
+            else:
+                lexer.clear_dictionary()
+        lexer.plugin_key = plugin_key
+        lexer.digests = digests
+
+        if cached and cached == digests:
+            logging.info("Dictionary cache hit:" + plugin_key)
+            self.__freeze(lexer, name)
+            return True
+
+        # Retract the dictionaries that were removed or changed
+        for dic_path, digest in cached.items():
+            if digests.get(dic_path) != digest:
+                logging.info("Unload dic:" + dic_path)
+                lexer.unload_dictionary(dic_path)
+
+        # Load the dictionaries that were added or changed
+        for dic_path in dic_paths:
+            if cached.get(dic_path) == digests[dic_path]:
+                continue
+            logging.info("Analyze with dic:" + dic_path)
+            try:
+                with open(dic_path, 'r', encoding="utf-8") as d_file:
+                    lexer.load_dictionary(d_file, dic_path)
+            except Exception as e:
+                logging.exception(e)
+                pass
+
+        lexer.expand_dic()
+        self.__write(name, {"plugin": plugin_key,
+                            "digests": digests,
+                            "state": lexer.dump_dictionary()})
+        self.__freeze(lexer, name)
+        return False
+
+    def build_layered(self, base, lexer, language, project, plugin_path,
+                      general_paths, dic_paths):
+        """
+        Builds the general dictionaries into the base lexer and the project
+        dictionaries into the lexer on top of it. The base lexer is shared
+        by reference, so the warm one is reused by every project of the
+        language and only the small project layer is built for each of them.
+        Lexer gets the generation of both layers.
+        :param base: lexer of the general layer
+        :param lexer: lexer of the project layer
+        :param language:
+        :param project:
+        :param plugin_path:
+        :param general_paths: paths of the general dictionaries
+        :param dic_paths: paths of the project dictionaries
+        :return: True if both layers have been taken from cache unchanged
+        """
+        base_hit = self.build(base, (language,), plugin_path, general_paths)
+        hit = self.build(lexer, (language, project), plugin_path, dic_paths)
+        lexer.base = base
+        digests = dict(base.digests)
+        digests.update(lexer.digests)
+        lexer.generation = self.generation(lexer.plugin_key, digests)
+        return base_hit and hit
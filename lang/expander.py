@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import regex
+
+# Literal letters that follow ^ at the beginning of the pattern
+# e.g. ^ה.+ or (?P<beg>^ה.+)
+_PREFIX = regex.compile(r"^(?:\((?:\?P<\w+>)?)*\^(\p{L}+)(?![?*{])")
+# Literal letters that precede $ at the end of the pattern
+# e.g. ות$ or (?P<end>נ$)
+_SUFFIX = regex.compile(r"(\p{L}+)\$\)*$")
+# Substitution with group references only, e.g. \g<0>ים or ת\g<beg>י
+_SIMPLE_SUB = regex.compile(r"(?:\\g<\w+>|[^\\])*")
+_GROUP_REF = regex.compile(r"\\g<(\w+)>")
+
+
+def _literals(pattern):
+    """
+    Finds the literals that the pattern requires at the beginning and at the
+    end of the word. Patterns with escapes, alternatives, inline flags or
+    optional groups are never classified.
+    :param pattern:
+    :return: prefix, suffix; empty string if there is no such literal
+    """
+    if ("\\" in pattern or "|" in pattern or
+            pattern.count("(?") != pattern.count("(?P<") or
+            any(optional in pattern for optional in (")?", ")*", "){"))):
+        return "", ""
+
+    prefix = _PREFIX.search(pattern)
+    suffix = _SUFFIX.search(pattern)
+    return (prefix.group(1) if prefix else "",
+            suffix.group(1) if suffix else "")
+
+
+class _Group:
+    """ Reference to the group of match used by the substitution. """
+
+    def __init__(self, name):
+        self.name = name
+
+
+def _template(sub):
+    """
+    Splits the substitution into literals and group references, so it
+    doesn't have to be parsed for every match.
+    :param sub:
+    :return: tuple of strings and group references or the sub itself if it
+    uses escapes other than group references
+    """
+    if not _SIMPLE_SUB.fullmatch(sub):
+        return sub
+
+    parts = []
+    for i, part in enumerate(_GROUP_REF.split(sub)):
+        if i % 2 == 0:
+            if part:
+                parts.append(part)
+        else:
+            parts.append(_Group(int(part) if part.isdigit() else part))
+    return tuple(parts)
+
+
+def _expand(match, template):
+    if isinstance(template, str):
+        return match.expand(template)
+    return "".join([match.group(part.name) or ""
+                    if isinstance(part, _Group) else part
+                    for part in template])
+
+
+def _substitute(word, matches, template):
+    """
+    Same as pattern.sub(template, word) for already found matches.
+    """
+    if len(matches) == 1:
+        match = matches[0]
+        return word[:match.start()] + _expand(match, template) +\
+            word[match.end():]
+
+    parts = []
+    position = 0
+    for match in matches:
+        parts.append(word[position:match.start()])
+        parts.append(_expand(match, template))
+        position = match.end()
+    parts.append(word[position:])
+    return "".join(parts)
+
+
+class _Level:
+    """
+    Rules of one expansion level indexed by the literal the word
+    must start or end with.
+    """
+
+    def __init__(self, rules):
+        self.generic = []
+        self.by_prefix = {}
+        self.by_suffix = {}
+        for pattern, subs in rules:
+            prefix, suffix = _literals(pattern)
+            rule = (regex.compile(pattern), [_template(sub) for sub in subs],
+                    prefix, suffix)
+            if suffix:
+                self.by_suffix.setdefault(suffix[-1], []).append(rule)
+            elif prefix:
+                self.by_prefix.setdefault(prefix[0], []).append(rule)
+            else:
+                self.generic.append(rule)
+
+    def apply(self, word, forms):
+        """
+        Adds every form of the word produced by the level to forms.
+        """
+        # $ also matches before the trailing new line
+        tail = word[:-1] if word.endswith("\n") else word
+        for rules in (self.generic,
+                      self.by_suffix.get(tail[-1:], ()),
+                      self.by_prefix.get(word[:1], ())):
+            for p, subs, prefix, suffix in rules:
+                if not (tail.endswith(suffix) and word.startswith(prefix)):
+                    continue
+                matches = list(p.finditer(word))
+                if not matches:
+                    continue
+                # Add the word only if it could be transformed
+                for sub in subs:
+                    forms.add(_substitute(word, matches, sub))
+
+
+class Expander:
+    """
+    Transforms the base word into the set of its forms using the patterns
+    of plugin. Every level is applied to the forms given by the previous one.
+    """
+
+    def __init__(self):
+        self.levels = []
+
+    def load(self, patterns):
+        """
+        Compiles the patterns of plugin.
+        :param patterns: dict level -> list of [pattern, list of subs]
+        """
+        self.levels = [_Level(patterns[level])
+                       for level in sorted(patterns.keys())]
+
+    def expand(self, word):
+        """
+        :param word:
+        :return: set of the forms given by the last level
+        """
+        before_state = {word}
+        for level in self.levels:
+            after_state = set()
+            for level_word in before_state:
+                level.apply(level_word, after_state)
+            # Push it to the next level
+            before_state = after_state
+        return before_state
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+import os
+import mmap
+import struct
+import zlib
+from array import array
+from collections.abc import Mapping
+
+# Magic, number of entries, number of slots of hash table
+_HEADER = struct.Struct("<8sII")
+_MAGIC = b"LTFROZ01"
+# Class byte of entry -> source of the word in Lexer.dic
+CLASSES = (None, "original", "expanded")
+# Number of looked up words remembered before the memo is cleared
+MEMO_SIZE = 1 << 16
+
+
+def _table_size(count):
+    size = 1
+    while size < 2 * count:
+        size *= 2
+    return size
+
+
+class FrozenDictionary(Mapping):
+    """
+    Read-only mapping word -> source that has the same lookups as
+    Lexer.dic but keeps every entry in one packed buffer: utf-8 words
+    sorted and concatenated, their offsets, one class byte per word and
+    open addressing hash table of entry numbers. The buffer is either
+    bytes or memory-mapped file, the mapped dictionary is pickled as its
+    path, so processes that analyze the files share the same pages.
+    Numbers are kept in native byte order, the file is not portable.
+    Words of the text repeat, so the results of lookups are remembered
+    in the small dict of the process.
+    """
+
+    def __init__(self, buffer, path=None):
+        """
+        :param buffer: bytes or mmap given by pack
+        :param path: path of the file mapped to buffer
+        """
+        magic, count, size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError("Not a frozen dictionary")
+        self.buffer = buffer
+        self.path = path
+        self.count = count
+        self.mask = size - 1
+        self.memo = {}  # word -> source or None
+
+        view = memoryview(buffer)
+        position = _HEADER.size
+        self.offsets = view[position:position + 4 * (count + 1)].cast("I")
+        position += 4 * (count + 1)
+        self.classes = view[position:position + count]
+        position += count + (-count) % 4
+        self.table = view[position:position + 4 * size].cast("I")
+        self.data_start = position + 4 * size
+
+    @staticmethod
+    def pack(dic):
+        """
+        Packs the dictionary into the buffer of frozen dictionary.
+        :param dic: dict word -> "original" or "expanded"
+        :return: bytes
+        """
+        words = sorted(dic)
+        keys = [word.encode("utf-8") for word in words]
+        offsets = array("I", [0])
+        total = 0
+        for key in keys:
+            total += len(key)
+            offsets.append(total)
+        classes = bytes(CLASSES.index(dic[word]) for word in words)
+
+        size = _table_size(len(keys))
+        mask = size - 1
+        table = array("I", [0]) * size
+        for index, key in enumerate(keys):
+            slot = zlib.crc32(key) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = index + 1
+
+        return b"".join([_HEADER.pack(_MAGIC, len(keys), size),
+                         offsets.tobytes(), classes,
+                         bytes((-len(keys)) % 4), table.tobytes()] + keys)
+
+    @classmethod
+    def freeze(cls, dic, path):
+        """
+        Writes the frozen dictionary to the file and maps it. The file is
+        replaced at once, so the other process never maps the half of it.
+        :param dic: dict word -> "original" or "expanded"
+        :param path:
+        :return: FrozenDictionary
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(cls.pack(dic))
+        os.replace(tmp_path, path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Maps the file written by freeze.
+        :param path:
+        :return: FrozenDictionary
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    def __reduce__(self):
+        if self.path is not None:
+            return self.open, (self.path, )
+        return FrozenDictionary, (bytes(self.buffer), )
+
+    def __find(self, word):
+        key = word.encode("utf-8")
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            index = self.table[slot]
+            if not index:
+                return -1
+            index -= 1
+            start = self.data_start + self.offsets[index]
+            end = self.data_start + self.offsets[index + 1]
+            if self.buffer[start:end] == key:
+                return index
+            slot = (slot + 1) & self.mask
+
+    def __word(self, index):
+        start = self.data_start + self.offsets[index]
+        end = self.data_start + self.offsets[index + 1]
+        return self.buffer[start:end].decode("utf-8")
+
+    def __source(self, word):
+        try:
+            return self.memo[word]
+        except KeyError:
+            pass
+        index = self.__find(word)
+        source = CLASSES[self.classes[index]] if index >= 0 else None
+        if len(self.memo) >= MEMO_SIZE:
+            self.memo.clear()
+        self.memo[word] = source
+        return source
+
+    def get(self, word, default=None):
+        source = self.__source(word)
+        return default if source is None else source
+
+    def __getitem__(self, word):
+        source = self.__source(word)
+        if source is None:
+            raise KeyError(word)
+        return source
+
+    def __contains__(self, word):
+        return self.__source(word) is not None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (self.__word(index) for index in range(self.count))
+
+    def items(self):
+        """
+        :return: iterator of (word, source) in sorted order of words
+        """
+        return ((self.__word(index), CLASSES[self.classes[index]])
+                for index in range(self.count))
@@ -1,16 +1,41 @@
 # -*- coding: utf-8 -*-
 
-import regex
 from collections import defaultdict
-from lang.tokenizer import Tokenizer
+from lang.tokenizer import Tokenizer, StreamTokenizer
+from lang.expander import Expander
+
+
+def _build_trie(words):
+    """
+    Builds the trie of nested dicts, key None marks the end of word.
+    :param words:
+    :return: root node
+    """
+    root = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = True
+    return root
 
 
 class Lexer:
 
     def __init__(self):
-        self.patterns = {}
+        self.expander = Expander()
         self.prefixes = []
+        self.prefix_trie = {}
         self.dic = {}
+        self.base = None  # Lexer of the shared layer below the dictionary
+        self.generation = None  # Id of the inputs the dictionary is built of
+        self.plugin_key = None  # Id of the plugin the dictionary is built with
+        self.digests = {}  # dictionary file -> digest of its loaded content
+
+        # Provenance of the dictionary
+        self.sources = {}  # source -> set of base words loaded from it
+        self.expansions = {}  # base word -> tuple of its expanded forms
+        self.refs = defaultdict(int)  # form -> number of base words giving it
 
         # Current text counters
         self.c_dic_unknown = defaultdict(int)
@@ -22,11 +47,44 @@ class Lexer:
         if word not in self.dic:
             self.dic[word] = source
 
+    def __retract(self, word):
+        """
+        Removes base word and the forms that no other base word produces.
+        """
+        self.dic.pop(word, None)
+        for form in self.expansions.pop(word, ()):
+            self.refs[form] -= 1
+            if not self.refs[form]:
+                del self.refs[form]
+                if self.dic.get(form) == "expanded":
+                    del self.dic[form]
+        # The word might still be the form of another base word
+        if word in self.refs:
+            self.dic[word] = "expanded"
+
+    def lookup(self, word):
+        """
+        Finds the word in the dictionary and in the layers below it, the
+        original word of any layer is known.
+        :param word:
+        :return: "original", "expanded" or None if there is no such word
+        """
+        source = self.dic.get(word)
+        if source == "original" or self.base is None:
+            return source
+        return self.base.lookup(word) or source
+
     def __is_expandable(self, token_word):
-        for prefix in self.prefixes:
-            if (token_word.startswith(prefix) and
-                    token_word[len(prefix):] in self.dic):
+        # Walk the token once, every prefix found on the way is checked
+        node = self.prefix_trie
+        position = 0
+        while node is not None:
+            if None in node and self.lookup(token_word[position:]):
                 return True
+            if position == len(token_word):
+                break
+            node = node.get(token_word[position])
+            position += 1
 
         return False
 
@@ -35,8 +93,9 @@ class Lexer:
         word = word.lower()
         if description["type"] == "word":
             self.c_text_size += 1
-            if word in self.dic:
-                if self.dic[word] == "original":
+            source = self.lookup(word)
+            if source:
+                if source == "original":
                     self.c_known += 1
                     description["class"] = "known"
                 else:
@@ -50,49 +109,145 @@ class Lexer:
                 self.c_dic_unknown[word] += 1
         return token
 
-    def analyze(self, content):
-        content = content.read()
-        tokens = Tokenizer(content)
-        # Reset Current text counters.
+    def __reset_counters(self):
         self.c_dic_unknown.clear()
         self.c_known = 0
         self.c_text_size = 0
         self.c_might_know = 0
 
+    def analyze(self, content):
+        content = content.read()
+        tokens = Tokenizer(content)
+        # Reset Current text counters.
+        self.__reset_counters()
+
         new_tokens = [self.__analyze_token(token) for token in tokens]
         return new_tokens, self.c_dic_unknown,\
             self.c_text_size, self.c_known, self.c_might_know
 
-    def load_dictionary(self, content):
+    def analyze_stream(self, content, chunk_size=1 << 16):
+        """
+        Analyzes the text reading it from content chunk by chunk. Tokens are
+        given lazily and the counters are accumulated as they go, the
+        counters are complete when the iterator is exhausted.
+        :param content: file-like object
+        :param chunk_size: number of characters read at once
+        :return: iterator of analyzed tokens
+        """
+        # Reset Current text counters.
+        self.__reset_counters()
+
+        for token in StreamTokenizer(content, chunk_size):
+            yield self.__analyze_token(token)
+
+    def counters(self):
+        """
+        Provides the counters of the last analyzed text.
+        :return: dic_unknown, text_size, known, maybe
+        """
+        return self.c_dic_unknown, self.c_text_size,\
+            self.c_known, self.c_might_know
+
+    def load_dictionary(self, content, source=None):
+        """
+        Loads base words into dictionary.
+        :param content: file-like object
+        :param source: name of the source, allows to unload it later
+        """
         content = content.read().lower()
-        words = Tokenizer(content)
+        base = {content[start:end]
+                for start, end, kind in Tokenizer(content).spans()
+                if kind == "word"}
+        for word in base:
+            self.dic[word] = "original"
+        if source is not None:
+            self.sources.setdefault(source, set()).update(base)
+
+    def unload_dictionary(self, source):
+        """
+        Removes the base words of the given source and every expanded form
+        that came only from them.
+        :param source:
+        """
+        words = self.sources.pop(source, set())
+        for other in self.sources.values():
+            words -= other
         for word in words:
-            self.__put_to_dic(word[0], "original")
+            self.__retract(word)
+
+    def copy_for_analysis(self):
+        """
+        Provides the lexer that shares the dictionary, its layers and
+        prefixes, but has neither patterns nor provenance, so it's cheap to
+        send it to other processes. Frozen dictionary is sent as the path
+        of its file.
+        :return:
+        """
+        lexer = Lexer()
+        lexer.dic = self.dic
+        if self.base is not None:
+            lexer.base = self.base.copy_for_analysis()
+        lexer.prefixes = self.prefixes
+        lexer.prefix_trie = self.prefix_trie
+        return lexer
+
+    def dump_dictionary(self):
+        """
+        Provides the dictionary with its provenance.
+        :return: state that could be restored with restore_dictionary
+        """
+        return {"dic": self.dic,
+                "sources": self.sources,
+                "expansions": self.expansions,
+                "refs": dict(self.refs)}
+
+    def restore_dictionary(self, state):
+        """
+        Replaces the dictionary with the one given by dump_dictionary.
+        :param state:
+        """
+        self.dic = state["dic"]
+        self.sources = state["sources"]
+        self.expansions = state["expansions"]
+        self.refs = defaultdict(int, state["refs"])
+
+    def freeze(self, frozen):
+        """
+        Replaces the dictionary with its frozen copy and drops the
+        provenance. Dictionary of the frozen lexer can't be changed until
+        it's replaced with restore_dictionary or clear_dictionary.
+        :param frozen: FrozenDictionary of the current dictionary
+        """
+        self.dic = frozen
+        self.sources = {}
+        self.expansions = {}
+        self.refs = defaultdict(int)
+
+    def clear_dictionary(self):
+        """
+        Replaces the dictionary with the empty one.
+        """
+        self.dic = {}
+        self.sources = {}
+        self.expansions = {}
+        self.refs = defaultdict(int)
 
     def load_plugin(self, plugin):
         if "pattern" in plugin:
-            for level in plugin["pattern"]:
-                self.patterns[level] = []
-                for pattern, subs in plugin["pattern"][level]:
-                    p = regex.compile(pattern)
-                    for sub in subs:
-                        self.patterns[level].append((p, sub))
+            self.expander.load(plugin["pattern"])
         if "prefix" in plugin:
             self.prefixes = plugin["prefix"]
+            self.prefix_trie = _build_trie(self.prefixes)
 
     def expand_dic(self):
-        before_state = set(self.dic.keys())
-        for i, level in enumerate(sorted(self.patterns.keys())):
-            after_state = set()
-            for word in before_state:
-                # Transform the word into new form
-                for p, sub in self.patterns[level]:
-                    if p.search(word):
-                        # Add the word only if it could be transformed
-                        new_word = p.sub(sub, word)
-                        after_state.add(new_word)
-            # Push it to the next level
-            before_state = after_state
-        # Copy the final state to Dictionary
-        for word in before_state:
-            self.__put_to_dic(word, "expanded")
+        """
+        Expands the base words that have not been expanded yet.
+        """
+        new_words = [word for word, source in self.dic.items()
+                     if source == "original" and word not in self.expansions]
+        for word in new_words:
+            forms = tuple(self.expander.expand(word))
+            self.expansions[word] = forms
+            for form in forms:
+                self.refs[form] += 1
+                self.__put_to_dic(form, "expanded")
@@ -1,6 +1,18 @@
 # -*- coding: utf-8 -*-
 
-from yattag import Doc
+import io
+from html import escape
+
+DEFAULT_STYLE = 'body {font-family:sans-serif; \
+                         line-height: 1.5;}' +\
+                'span.known \
+                         {background-color: white; \
+                         font-weight: normal;font-style: normal; \
+                         border-bottom: 3px solid green;}' +\
+                'span.maybe \
+                         {background-color: white; \
+                         font-weight: normal;font-style: normal; \
+                         border-bottom: 3px solid yellowgreen;}'
 
 
 def _wrap_with_mark(token):
@@ -17,43 +29,36 @@ def _wrap_with_mark(token):
     return token_text
 
 
+def write_page(out, name, lexi_text, style=""):
+    """
+    Writes HTML page to out as the tokens arrive, every line of the text
+    becomes a paragraph.
+    :param out: writable file-like object
+    :param name: title of the HTML page
+    :param lexi_text: iterable of marked tokens
+    :param style: css, default style is used if empty
+    """
+    out.write('<!DOCTYPE html><html><meta charset="utf-8" /><title>')
+    out.write(escape(name, quote=False))
+    out.write('</title><body><article><p>')
+    for token in lexi_text:
+        lines = _wrap_with_mark(token).split('\n')
+        out.write(lines[0])
+        for line in lines[1:]:
+            out.write('</p><p>')
+            out.write(line)
+    out.write('</p></article><style>')
+    # Use user defined style or default one
+    out.write(escape(style or DEFAULT_STYLE, quote=False))
+    out.write('</style></body></html>')
+
+
 def print_page(name, lexi_text, style=""):
     """
     :param name: title of the HTML page
     :param lexi_text: text with marked words
     :return: HTML page
     """
-    # Prepare text
-    lexi_text = "".join([_wrap_with_mark(token)
-                         for token in lexi_text])
-
-    # Convert text to html
-    doc, tag, text = Doc().tagtext()
-    doc.asis('<!DOCTYPE html>')
-    with tag('html'):
-        doc.stag('meta', charset='utf-8')
-        with tag('title'):
-            text(name)
-        with tag('body'):
-            with tag('article'):
-                lines = lexi_text.split('\n')
-                for line in lines:
-                    with tag('p'):
-                        doc.asis(line)
-            if style:  # Use user defined style
-                with tag('style'):
-                    text(style)
-            else:  # Use default style
-                with tag('style'):
-                    text('body {font-family:sans-serif; \
-                         line-height: 1.5;}')
-                    text('span.known \
-                         {background-color: white; \
-                         font-weight: normal;font-style: normal; \
-                         border-bottom: 3px solid green;}')
-                    text('span.maybe \
-                         {background-color: white; \
-                         font-weight: normal;font-style: normal; \
-                         border-bottom: 3px solid yellowgreen;}')
-
-    return doc.getvalue()
+    page = io.StringIO()
+    write_page(page, name, lexi_text, style)
+    return page.getvalue()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+
+class LexerRegistry:
+    """
+    Keeps one warm lexer of the general dictionaries per language between
+    runs, so they are expanded once and shared by all projects of the
+    language.
+    The lexer is lent to one worker at a time and given back when the
+    worker is done. The lexer lent before its dictionaries have changed is
+    not taken back.
+    """
+
+    def __init__(self):
+        self.lexers = {}  # language -> lexer
+        self.versions = defaultdict(int)  # language -> number of changes
+
+    def lend(self, language):
+        """
+        :param language:
+        :return: lexer or None if there is no warm one, version of the
+        dictionaries of language
+        """
+        return self.lexers.pop(language, None), self.versions[language]
+
+    def give_back(self, language, lexer, version):
+        """
+        Keeps the lexer unless the dictionaries of language have changed
+        since it was lent.
+        :param language:
+        :param lexer:
+        :param version: version given by lend
+        """
+        if version == self.versions[language]:
+            self.lexers[language] = lexer
+
+    def invalidate(self, language):
+        """
+        Drops the lexer of language, its dictionaries have changed.
+        :param language:
+        """
+        self.versions[language] += 1
+        self.lexers.pop(language, None)
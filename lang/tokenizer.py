@@ -2,6 +2,16 @@
 
 import regex
 
+# Marks that join two runs of letters into one word
+QUOTES = "״'׳\""
+WORD = regex.compile(
+    r"""(
+    \p{L}+   # any character of: UTF macro 'Letter' 1 or more times
+    ([״'׳"]      # \' or ׳(0x5f3) symbol exactly once
+    \p{L}+   # any character of: UTF macro 'Letter' 1 or more times
+    )?       # optionally
+    )""", regex.VERBOSE)
+
 
 class Tokenizer:
     """ Takes a string and returns iterator of tokens. """
@@ -10,25 +20,63 @@ class Tokenizer:
         self.string = string
 
     def __iter__(self):
-        # Calculating string bounds
+        string = self.string
+        position = 0
+        for match in WORD.finditer(string):
+            start, end = match.span()
+            if position != start:  # Some non-letters are left before word
+                yield string[position:start], {"type": "non_word"}
+            yield match.group(), {"type": "word"}
+            position = end
+        if position < len(string):  # Some trailing characters are left
+            yield string[position:], {"type": "non_word"}
+
+    def spans(self):
+        """
+        Iterates over the bounds of tokens without copying the text.
+        :return: iterator of (start, end, type)
+        """
         position = 0
-        self.length = len(self.string)
-        self.word = regex.compile(
-            r"""(
-            \p{L}+   # any character of: UTF macro 'Letter' 1 or more times
-            ([״'׳"]      # \' or ׳(0x5f3) symbol exactly once
-            \p{L}+   # any character of: UTF macro 'Letter' 1 or more times
-            )?       # optionally
-            )""", regex.VERBOSE)
-        while position < self.length:
-            match = self.word.search(self.string, position)
-            if not match:  # No words left, will return some trailing characters
-                yield self.string[position:], {"type": "non_word"}
-                position = self.length
-            else:
-                start = match.start()
-                end = match.end()
-                if position != start:  # Some non-letters are left before word
-                    yield self.string[position:start], {"type": "non_word"}
-                yield self.string[start:end], {"type": "word"}
-                position = end
+        for match in WORD.finditer(self.string):
+            start, end = match.span()
+            if position != start:  # Some non-letters are left before word
+                yield position, start, "non_word"
+            yield start, end, "word"
+            position = end
+        if position < len(self.string):  # Some trailing characters are left
+            yield position, len(self.string), "non_word"
+
+
+class StreamTokenizer:
+    """
+    Takes a file-like object and returns iterator of tokens. Text is read
+    in chunks, the last word of the chunk is held back until the next chunk
+    shows where the word ends. Non-letters never join the next word, so
+    they are given at once; long run of them might come in several tokens.
+    """
+
+    def __init__(self, content, chunk_size=1 << 16):
+        self.content = content
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        tail = ""
+        while True:
+            chunk = self.content.read(self.chunk_size)
+            if not chunk:
+                break
+            string = tail + chunk
+            spans = list(Tokenizer(string).spans())
+            # The last word might go on in the next chunk, so does the word
+            # followed by the quote
+            keep = len(spans)
+            if spans[-1][2] == "word":
+                keep -= 1
+            elif len(spans) > 1 and spans[-2][2] == "word" and \
+                    string[spans[-1][0]:] in QUOTES:
+                keep -= 2
+            for start, end, kind in spans[:keep]:
+                yield string[start:end], {"type": kind}
+            tail = string[spans[keep][0]:] if keep < len(spans) else ""
+
+        yield from Tokenizer(tail)
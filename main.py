@@ -3,17 +3,20 @@ import sys
 import os
 import logging
 import json
+import multiprocessing
+import functools
 
 from ui.mainWindow import Ui_MainWindow
 import manager
 import storage
 import config
-from lang.lexer import Lexer
-import lang.printer as printer
-from baseTableModel import BaseTaBleModel
+from lang.cache import DictionaryCache
+from lang.registry import LexerRegistry
+from worker import ProjectWorker
+from baseTableModel import BaseTaBleModel, PagedTableModel
 
 from PyQt5.QtCore import Qt, pyqtSignal, QFileSystemWatcher, QUrl, QFile,\
-    QVariant, QSortFilterProxyModel
+    QVariant, QSortFilterProxyModel, QTimer, QModelIndex
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import QApplication, QAbstractItemView,\
     QMainWindow, QProgressDialog, QMessageBox, QHeaderView
@@ -43,9 +46,13 @@ def list_dir(dir_name, ext_list):
     return dir_list
 
 
+def plugin_file(lang):
+    return os.path.join(os.getcwd(), "plugins", lang + ".json")
+
+
 def fetch_plugin(lang):
     plugin = {}
-    plugin_name = os.path.join(os.getcwd(), "plugins", lang + ".json")
+    plugin_name = plugin_file(lang)
     logging.info("Analyze with plugin_name:" + plugin_name)
 
     try:
@@ -58,6 +65,15 @@ def fetch_plugin(lang):
     return plugin
 
 
+def remove_file(path):
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception as e:
+            logging.exception(e)
+            pass
+
+
 def fetch_css_file(lang):
     css = ""
     css_file_name = os.path.join(os.getcwd(), "plugins", lang + ".css")
@@ -73,24 +89,131 @@ def fetch_css_file(lang):
     return css
 
 
-class Watcher(QFileSystemWatcher):
+def snapshot(folder):
+    """
+    Provides the modification time and size of every file in the folder.
+    :param folder:
+    :return: dict name -> (mtime, size)
+    """
+    files = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime, stat.st_size)
+    except OSError as e:
+        logging.exception(e)
 
-    def __init__(self):
+    return files
+
+
+class Watcher(QFileSystemWatcher):
+    """
+    Watches directories and reports which files were added, removed or
+    modified. Events are collected until there is no new one for the
+    delay, so the burst of events is reported once. Changes of the file
+    content that are made in place are seen only in the directories whose
+    files are watched too.
+    """
+
+    # folder, added files, removed files, modified files
+    filesChanged = pyqtSignal(str, list, list, list)
+
+    def __init__(self, delay=config.watcher_delay):
         super(Watcher, self).__init__()
+        self.file_dirs = set()  # Directories whose files are watched
+        self.snapshots = {}
+        self.pending = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.report)
+        self.directoryChanged.connect(self.directory_changed)
+        self.fileChanged.connect(self.file_changed)
 
     def halt(self):
-        old_folders = self.directories()
+        self.pause()
+        self.snapshots = {}
+
+    def pause(self):
+        """
+        Stops watching, but keeps the snapshots, so the changes made
+        meanwhile are reported by resume.
+        """
+        old_folders = self.directories() + self.files()
         # Unset directories
         if old_folders:
             self.removePaths(old_folders)
+        self.timer.stop()
+        self.pending.clear()
 
-    def set_dirs(self, dirs):
+    def resume(self, dirs):
+        """
+        Watches the directories again and reports the changes made since
+        the watcher has been paused. Every file of the directory that had
+        no snapshot is reported as added.
+        :param dirs:
+        """
+        for folder in dirs:
+            if os.path.exists(folder):
+                self.addPath(folder)
+                old = self.snapshots.setdefault(folder, {})
+                self.add_files(folder, [
+                    name for name in old
+                    if os.path.exists(os.path.join(folder, name))])
+                self.pending.add(folder)
+        self.report()
+
+    def set_dirs(self, dirs, file_dirs=()):
+        """
+        :param dirs: directories to watch
+        :param file_dirs: those of dirs whose files are watched too
+        """
         self.halt()
+        self.file_dirs = set(file_dirs)
         # Set new directories
         for folder in dirs:
             logging.info("FileWatcher dirs:" + folder)
             if os.path.exists(folder):
                 self.addPath(folder)
+                self.snapshots[folder] = snapshot(folder)
+                self.add_files(folder, self.snapshots[folder])
+
+    def add_files(self, folder, names):
+        if folder in self.file_dirs and names:
+            self.addPaths([os.path.join(folder, name) for name in names])
+
+    def directory_changed(self, folder):
+        self.pending.add(folder)
+        self.timer.start()  # Restarts the timer if it's running
+
+    def file_changed(self, path):
+        self.directory_changed(os.path.dirname(path))
+
+    def report(self):
+        """
+        Compares the folders that had events with their last snapshots.
+        """
+        pending, self.pending = self.pending, set()
+        watched = set(self.files())
+        for folder in pending:
+            if folder not in self.snapshots:
+                continue
+            old = self.snapshots[folder]
+            new = snapshot(folder)
+            self.snapshots[folder] = new
+            added = [name for name in new if name not in old]
+            removed = [name for name in old if name not in new]
+            modified = [name for name in new
+                        if name in old and new[name] != old[name]]
+            # Files replaced on save are no longer watched
+            self.add_files(folder, [name for name in added + modified
+                                    if os.path.join(folder, name)
+                                    not in watched])
+            if added or removed or modified:
+                logging.info("FileWatcher changes:" + folder)
+                self.filesChanged.emit(folder, added, removed, modified)
 
 
 class FilesModel(BaseTaBleModel):
@@ -98,11 +221,19 @@ class FilesModel(BaseTaBleModel):
 
     def __init__(self):
         super(FilesModel, self).__init__(self.headers)
+        self.rows = {}  # name -> row
+        self.totals = [0, 0, 0, 0]  # size, known, maybe, unknown
 
-    def prepare(self):
-        super(FilesModel, self).prepare()
+    def set_rows(self, rows):
         # Add Total line to filesTable
-        row = self.add_row("Total", 0, 0, 0.0, 0, 0.0, 0, 0.0)
+        super(FilesModel, self).set_rows(
+            list(rows) + [("Total", 0, 0, 0.0, 0, 0.0, 0, 0.0)])
+        self.rows = {}
+        self.totals = [0, 0, 0, 0]
+        for row, item in enumerate(self.items[:-1]):
+            self.rows[item[0]] = row
+            self.__count(item, 1)
+        self.recalculate_total()
 
     def data(self, index, role=None):
         if not index.isValid():
@@ -122,44 +253,82 @@ class FilesModel(BaseTaBleModel):
             data = "{0:.2f}".format(data)
         return QVariant(data)
 
+    def __count(self, item, sign):
+        """
+        Adds the stats of the row to totals or subtracts them.
+        """
+        for i, column in enumerate([1, 2, 4, 6]):
+            if item[column]:
+                self.totals[i] += sign * item[column]
+
+    def __set_row(self, row, values):
+        self.items[row] = list(values)
+        self.dataChanged.emit(self.index(row, 0),
+                              self.index(row, self.columnCount() - 1))
+
+    def update_file(self, name, *stats):
+        """
+        Puts the new stats of the file into its row and Total line.
+        :param name:
+        :param stats: size, known, pknown, maybe, pmaybe, unknown, punknown
+        :return: False if the file has no row
+        """
+        row = self.rows.get(name)
+        if row is None:
+            return False
+
+        self.__count(self.items[row], -1)
+        self.__set_row(row, (name, ) + stats)
+        self.__count(self.items[row], 1)
+        self.recalculate_total()
+        return True
+
+    def add_file(self, name):
+        """
+        Adds the row without stats for the file above Total line.
+        :param name:
+        """
+        if name in self.rows:
+            return
+
+        row = self.rowCount() - 1
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.items.insert(row, [name] + [None] * (self.columnCount() - 1))
+        self.rows[name] = row
+        self.endInsertRows()
+
+    def remove_file(self, name):
+        """
+        Removes the row of the file and its stats from Total line.
+        :param name:
+        """
+        row = self.rows.pop(name, None)
+        if row is None:
+            return
+
+        self.__count(self.items[row], -1)
+        self.removeRows(row, 1)
+        for shifted in range(row, self.rowCount() - 1):
+            self.rows[self.items[shifted][0]] = shifted
+        self.recalculate_total()
+
     def recalculate_total(self):
         """
-        Recalculates the total stats for project and puts them into Total line.
+        Puts the total stats for project into Total line.
         """
-        last_row = self.rowCount() - 1
+        size, known, maybe, unknown = self.totals
 
-        size = 0
-        known = 0
         pknown = 0
-        maybe = 0
         pmaybe = 0
-        unknown = 0
         punknown = 0
-
-        fnt = QFont()
-        fnt.setBold(True)
-
-        for i in range(last_row):
-            file_size = self.items[i][1]
-            if file_size:
-                size += file_size
-            file_known = self.items[i][2]
-            if file_known:
-                known += file_known
-            file_maybe = self.items[i][4]
-            if file_maybe:
-                maybe += file_maybe
-            file_unknown = self.items[i][6]
-            if file_unknown:
-                unknown += file_unknown
-
         if size != 0:
             pknown = known / size
             pmaybe = maybe / size
             punknown = unknown / size
 
-        self.update_row(last_row, self.items[last_row][0], size, known, pknown,
-                        maybe, pmaybe, unknown, punknown)
+        last_row = self.rowCount() - 1
+        self.__set_row(last_row, (self.items[last_row][0], size, known,
+                                  pknown, maybe, pmaybe, unknown, punknown))
 
 
 class SortingWithTotal(QSortFilterProxyModel):
@@ -181,7 +350,7 @@ class MainWindow(Ui_MainWindow, QMainWindow):
 
     projectIsReady = pyqtSignal()  # A signal showing that analyze is finished
 
-    def __init__(self, watcher, dic_watcher, storage):
+    def __init__(self, watcher, dic_watcher, storage, cache):
         super(MainWindow, self).__init__()
         # Set up the user interface from Designer.
         self.setupUi(self)
@@ -193,10 +362,9 @@ class MainWindow(Ui_MainWindow, QMainWindow):
             .setSectionResizeMode(0, QHeaderView.Stretch)
         self.dicsTable.setSelectionMode(QAbstractItemView.SingleSelection)
 
-        self.words_model = BaseTaBleModel(["Word", "Quantity"])
-        self.words_proxy = QSortFilterProxyModel()
-        self.words_proxy.setSourceModel(self.words_model)
-        self.wordsTable.setModel(self.words_proxy)
+        # Words are sorted and loaded page by page by the model itself
+        self.words_model = PagedTableModel(["Word", "Quantity"])
+        self.wordsTable.setModel(self.words_model)
         self.wordsTable.setSortingEnabled(True)
         self.wordsTable.horizontalHeader()\
             .setSectionResizeMode(0, QHeaderView.Stretch)
@@ -213,11 +381,23 @@ class MainWindow(Ui_MainWindow, QMainWindow):
             self.filesTable.horizontalHeader()\
                 .setSectionResizeMode(header, QHeaderView.Stretch)
 
+        # Opt-in analysis of the files that appear or change in corpus
+        self.actionAutoAnalysis.setChecked(config.auto_analysis)
+
         # Create internal variables
         self.watcher = watcher
         self.dic_watcher = dic_watcher
         self.storage = storage
+        self.cache = cache
         self.langs = {}
+        self.project_worker = None
+        self.progress = None
+        self.old_stats = (None, None)
+        self.stats_index = None
+        self.watched_dirs = []
+        self.auto_queue = set()  # (language, project, file)
+        self.lexers = LexerRegistry()
+        self.lexer_version = 0  # Version of the lexer lent to worker
 
         # Set signals and slots
         self.languagesBox.currentIndexChanged.connect(self.language_chosen)
@@ -226,9 +406,9 @@ class MainWindow(Ui_MainWindow, QMainWindow):
         self.projectsBox.currentIndexChanged.connect(self.redraw_dics)
         self.projectsBox.currentIndexChanged.connect(self.redraw_word_list)
         self.filesTable.selectionModel().selectionChanged.connect(self.redraw_word_list)
-        self.watcher.directoryChanged.connect(self.redraw_files)
-        self.dic_watcher.directoryChanged.connect(self.redraw_dics)
-        self.projectIsReady.connect(self.redraw_files)
+        self.watcher.filesChanged.connect(self.files_changed)
+        self.dic_watcher.filesChanged.connect(self.dictionaries_changed)
+        self.projectIsReady.connect(self.refresh_files)
         self.projectIsReady.connect(self.redraw_word_list)
         self.filter.returnPressed.connect(self.redraw_files)
 
@@ -288,16 +468,14 @@ class MainWindow(Ui_MainWindow, QMainWindow):
         if index and index[0].row() != self.files_model.rowCount() - 1:
             # Get words for one file
             file_name = self.files_proxy.index(index[0].row(), 0).data()
-            records = self.storage.get_unknown_words_for_file(
-                        language, project, file_name)
         else:
             # Get words for whole project
-            records = self.storage.get_unknown_words(language, project)
-
-        for record in reversed(records):
-            self.words_model.add_row(record[0], record[1])
+            file_name = None
 
         self.wordsTable.sortByColumn(1, Qt.DescendingOrder)
+        self.words_model.set_source(functools.partial(
+            self.storage.get_unknown_words_page, language, project,
+            file_name))
 
     def redraw_dics(self):
         """
@@ -321,19 +499,22 @@ class MainWindow(Ui_MainWindow, QMainWindow):
         logging.info("general_dics:" + general_dics)
 
         # Allow watcher to watch for new dictionaries
-        self.dic_watcher.set_dirs([dic_dir, general_dics])
+        self.dic_watcher.set_dirs([dic_dir, general_dics],
+                                  [dic_dir, general_dics])
 
         # Add every file from dic and general dic dir
         dictionaries = set(list_dir(dic_dir, config.dic))
         gen_dictionaries = set(list_dir(general_dics, config.dic))
 
+        rows = []
         for file in dictionaries:
             logging.info("Draw dic file:" + file)
-            self.dics_model.add_row(file, project)
+            rows.append((file, project))
 
         for file in gen_dictionaries:
             logging.info("Draw dic file:" + file)
-            self.dics_model.add_row(file, "General")
+            rows.append((file, "General"))
+        self.dics_model.set_rows(rows)
 
     def redraw_files(self):
         """
@@ -357,7 +538,9 @@ class MainWindow(Ui_MainWindow, QMainWindow):
         logging.info("output_dir:" + output_dir)
 
         # Allow watcher to watch new directories
-        self.watcher.set_dirs([project_dir, output_dir])
+        self.watched_dirs = [project_dir, output_dir]
+        # Corpus files are edited in place, outputs are written by analysis
+        self.watcher.set_dirs(self.watched_dirs, [project_dir])
 
         # Add every file from project dir and output dir to table
         files = set(list_dir(project_dir, config.input))
@@ -373,6 +556,7 @@ class MainWindow(Ui_MainWindow, QMainWindow):
         filtered = self.filter.text()
 
         records = self.storage.get_files_stats(language, project, filtered)
+        rows = []
         to_drop = []
         for record in records:
             file, *stats = record
@@ -381,14 +565,14 @@ class MainWindow(Ui_MainWindow, QMainWindow):
             in_output = file in cleared_outputs
 
             if in_files and in_output:
-                self.files_model.add_row(*record)
+                rows.append(record)
                 files.remove(file)
                 cleared_outputs.remove(file)
             elif in_files:
-                self.files_model.add_row(*record)
+                rows.append(record)
                 files.remove(file)
             elif in_output:
-                self.files_model.add_row(*record)
+                rows.append(record)
                 cleared_outputs.remove(file)
             else:
                 to_drop.append(file)
@@ -399,22 +583,130 @@ class MainWindow(Ui_MainWindow, QMainWindow):
                 logging.info("Draw file from dir:" + file)
                 in_output = file in cleared_outputs
                 if in_output:
-                    self.files_model.add_row(file)
+                    rows.append((file, ))
                     cleared_outputs.remove(file)
                 else:
-                    self.files_model.add_row(file)
+                    rows.append((file, ))
 
             for file in cleared_outputs:
                 logging.info("Draw file from output:" + file)
-                self.files_model.add_row(file)
+                rows.append((file, ))
 
-        self.files_model.recalculate_total()
+        self.files_model.set_rows(rows)
 
         self.filesTable.sortByColumn(7, Qt.AscendingOrder)
 
         # Drop stats from DB if there is no file for it nor output file
-        for dropname in to_drop:
-            self.storage.remove_file(dropname, language, project)
+        with self.storage.transaction():
+            for dropname in to_drop:
+                self.storage.remove_file(dropname, language, project)
+
+    def files_changed(self, folder, added, removed, modified):
+        """
+        Refreshes the rows of files that were added to or removed from
+        corpus or output directory.
+        """
+        project = self.projectsBox.currentText()
+        language = self.languagesBox.currentText()
+        if not(project and language):
+            return
+
+        lang_folder = self.langs[language]
+        project_dir = os.path.join(lang_folder, config.corpus_dir, project)
+        output_dir = os.path.join(lang_folder, config.output_dir, project)
+
+        # Every input file has the path of output file as a pair
+        if folder == project_dir:
+            extensions, pair_dir = config.input, output_dir
+        elif folder == output_dir:
+            extensions, pair_dir = config.output, project_dir
+        else:
+            return
+
+        def pair(name):
+            base, ext = os.path.splitext(name)
+            return base + extensions[ext]
+
+        def file_name(name):
+            return name if folder == project_dir else pair(name)
+
+        for name in added:
+            # Files w/o stats are not shown in filtering mode
+            if os.path.splitext(name)[1] in extensions and \
+                    not self.filter.text():
+                logging.info("Draw added file:" + name)
+                self.files_model.add_file(file_name(name))
+
+        if folder == project_dir and self.actionAutoAnalysis.isChecked():
+            for name in added + modified:
+                if os.path.splitext(name)[1] in extensions:
+                    logging.info("Queue for analysis:" + name)
+                    self.auto_queue.add((language, project, name))
+
+        with self.storage.transaction():
+            for name in removed:
+                if os.path.splitext(name)[1] not in extensions or \
+                        os.path.exists(os.path.join(pair_dir, pair(name))):
+                    continue
+                # Drop stats from DB if there is no file nor output file
+                logging.info("Drop removed file:" + name)
+                self.files_model.remove_file(file_name(name))
+                self.storage.remove_file(file_name(name), language, project)
+
+        self.analyze_queued()
+
+    def refresh_files(self):
+        """
+        Brings the list of files up to date after analysis. Rows of the
+        analyzed files are already updated, the files added or removed
+        during the analysis are reported by the paused watcher. The
+        filtered list is redrawn since other files could match the filter
+        now.
+        """
+        if not self.watcher.directories():  # Paused by analysis
+            self.watcher.resume(self.watched_dirs)
+        if self.filter.text():
+            self.redraw_files()
+
+    def dictionaries_changed(self, folder):
+        """
+        Redraws the list of dictionaries and drops the general lexer built
+        with the old ones. Project layer is rebuilt by every run anyway.
+        """
+        language = self.languagesBox.currentText()
+        general_dics = os.path.join(self.langs.get(language, ""),
+                                    config.dic_dir)
+        if language and os.path.normpath(folder) == \
+                os.path.normpath(general_dics):
+            self.lexers.invalidate(language)
+        self.redraw_dics()
+
+    def analyze_queued(self):
+        """
+        Analyzes the new and modified files of current project in the
+        background, if auto analysis is on.
+        """
+        if self.project_worker is not None or not self.auto_queue:
+            return  # Queue is checked again when worker is done
+
+        project = self.projectsBox.currentText()
+        language = self.languagesBox.currentText()
+        queue, self.auto_queue = self.auto_queue, set()
+        if not (self.actionAutoAnalysis.isChecked() and project and
+                language):
+            return
+
+        project_dir = os.path.join(self.langs[language], config.corpus_dir,
+                                   project)
+        files = [file for lang, proj, file in queue
+                 if (lang, proj) == (language, project) and
+                 os.path.exists(os.path.join(project_dir, file))]
+        if not (files and any(self.dictionary_paths(language, project))):
+            return
+
+        logging.info("Auto analysis of {0} files".format(len(files)))
+        self.runProject.setEnabled(False)
+        self.start_worker(language, project, files)
 
     def language_chosen(self):
         """
@@ -440,8 +732,9 @@ class MainWindow(Ui_MainWindow, QMainWindow):
                         in_storage.remove(directory)
 
             # Remove unused projects from DB
-            for proj in in_storage:
-                self.storage.remove_project(lang, proj)
+            with self.storage.transaction():
+                for proj in in_storage:
+                    self.storage.remove_project(lang, proj)
 
     def run_project_clicked(self):
         """
@@ -495,131 +788,164 @@ class MainWindow(Ui_MainWindow, QMainWindow):
                                     "There are no files.")
             return
 
-        # Build lexer for current project
-        lexer = Lexer()
+        if self.project_worker is not None:  # Auto analysis is running
+            return
 
         # Show progressbar and block whole main window
         progress = QProgressDialog("Processing...", "Cancel", 0, 10000, self)
         progress.setMinimumDuration(0)
         progress.setWindowModality(Qt.WindowModal)
         self.menuBar.setEnabled(False)
+        self.runProject.setEnabled(False)
         progress.setValue(0)
 
-        # Load plugin into lexer if we have plugin
-        plugin = fetch_plugin(language)
-        lexer.load_plugin(plugin)
+        self.watcher.pause()  # Stop watching for directories, so the
+        # generated outputs wont be redrawn immediately. Emit signal
+        # afterward.
+        self.progress = progress
+        self.start_worker(language, project, files)
+        self.project_worker.progressChanged.connect(progress.setValue)
+        progress.canceled.connect(self.project_worker.cancel)
 
-        # Update progressbar
-        progress.setValue(1000)
-        QApplication.processEvents()
-        if progress.wasCanceled():
-            return
+    def dictionary_paths(self, language, project):
+        """
+        Provides the paths of project and general dictionaries.
+        :return: list of project paths, list of general paths
+        """
+        folder = self.langs[language]
+        dic_dir = os.path.join(folder, config.dic_dir, project)
+        general_dics = os.path.join(folder, config.dic_dir)
+        dic_paths = [os.path.join(dic_dir, file)
+                     for file in set(list_dir(dic_dir, config.dic))]
+        general_paths = [os.path.join(general_dics, file)
+                         for file in set(list_dir(general_dics, config.dic))]
+        return dic_paths, general_paths
 
-        # Load dictionaries
-        for file in dictionaries:
-            dic_path = os.path.join(dic_dir, file)
-            logging.info("Analyze with dic:" + dic_path)
-            try:
-                with open(dic_path, 'r', encoding="utf-8") as d_file:
-                    lexer.load_dictionary(d_file)
-            except Exception as e:
-                logging.exception(e)
-                pass
-
-        # Load general dictionaries
-        for file in gen_dictionaries:
-            dic_path = os.path.join(general_dics, file)
-            logging.info("Analyze with dic:" + dic_path)
-            try:
-                with open(dic_path, 'r', encoding="utf-8") as d_file:
-                    lexer.load_dictionary(d_file)
-            except Exception as e:
-                logging.exception(e)
-                pass
-
-        # Test flatten dictionary feature
-        # with open('flat_dic.txt', 'w') as flat_dic:
-        #     for word in  sorted(lexer.dic.keys()):
-        #         flat_dic.write('{}\n'.format(word))
-
-        # Update progressbar
-        progress.setValue(2000)
-        QApplication.processEvents()
-        if progress.wasCanceled():
-            return
+    def start_worker(self, language, project, files):
+        """
+        Starts the analysis of given files of the project in background.
+        """
+        folder = self.langs[language]
+        project_dir = os.path.join(folder, config.corpus_dir, project)
+        output_dir = os.path.join(folder, config.output_dir, project)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
 
-        # Expand dictionary
-        lexer.expand_dic()
+        file_paths = []
+        for file in files:
+            file_path = os.path.join(project_dir, file)
+            base, ext = os.path.splitext(file)
+            out_path = os.path.join(output_dir, base + config.input[ext])
+            file_paths.append((file, file_path, out_path))
+
+        # Dictionaries are loaded and expanded by worker, cached result is
+        # reused if neither dictionaries nor plugin have changed. Warm
+        # general lexer of the language is shared by its projects, each of
+        # them builds only the layer of its own dictionaries.
+        base, self.lexer_version = self.lexers.lend(language)
+        dic_paths, general_paths = self.dictionary_paths(language, project)
+
+        self.old_stats = self.storage.get_total_stats(language, project)
+        self.stats_index = self.storage.get_stats_index(language, project)
+        self.project_worker = ProjectWorker(
+            self.cache, language, project, fetch_plugin(language),
+            plugin_file(language), dic_paths, general_paths,
+            file_paths, fetch_css_file(language),
+            self.storage.get_fingerprints(language, project), base)
+        self.project_worker.fileAnalyzed.connect(self.file_analyzed)
+        self.project_worker.fingerprintChanged.connect(
+            self.fingerprint_changed)
+        self.project_worker.finished.connect(self.project_analyzed)
+        self.project_worker.start()
+
+    def file_analyzed(self, file, dic_unknown, text_size, known, maybe):
+        """
+        Saves the results of file analysis given by project worker.
+        """
+        language = self.project_worker.language
+        project = self.project_worker.project
+        out_path = self.project_worker.out_paths[file]
+        # Marked text is written to temporary file, it replaces the
+        # output file only if the stats has changed.
+        tmp_path = out_path + config.tmp_ext
+
+        if text_size is not None:  # Analysis was successful
+            rowid = self.stats_index.changed(file, text_size, known, maybe)
+
+            if rowid != -1:
+                stats = self.storage.update_stat(rowid,
+                    language, project, file, text_size, known, maybe)
+                if (language, project) == (self.languagesBox.currentText(),
+                                           self.projectsBox.currentText()):
+                    self.files_model.update_file(file, *stats)
+                self.storage.update_words(
+                    language, project, file, dic_unknown)
+
+            # Save marked text to output dir
+            if not os.path.exists(out_path) or rowid != -1:
+                logging.info("Writing output to:" + out_path)
+                try:
+                    os.replace(tmp_path, out_path)
+                except Exception as e:
+                    logging.exception(e)
+                    pass
+
+        remove_file(tmp_path)
+
+    def fingerprint_changed(self, file, mtime, size, digest, generation):
+        """
+        Saves the fingerprint of the file given by project worker.
+        """
+        self.storage.update_fingerprint(
+            self.project_worker.language, self.project_worker.project,
+            file, mtime, size, digest, generation)
 
-        # Update progressbar
-        progress.setValue(3000)
-        QApplication.processEvents()
-        if progress.wasCanceled():
+    def project_analyzed(self):
+        """
+        Applies the results of project analysis when worker is done.
+        """
+        worker = self.project_worker
+        if worker is None:  # Already applied
             return
+        language = worker.language
+        project = worker.project
+        # Drop the outputs of the files abandoned by canceled worker
+        for out_path in worker.out_paths.values():
+            remove_file(out_path + config.tmp_ext)
 
-        # Analyze project files
-        step = 7000/len(files)
-        self.watcher.halt()  # Stop watching for directories, so the generated
-        # outputs wont be redrawn immediately. Emit signal afterward.
-        for file in files:
-            file_path = os.path.join(project_dir, file)
-            logging.info("Analyze the file:" + file_path)
-            text_size = None
-            try:
-                with open(file_path, 'r', encoding="utf-8") as i_file:
-                    lexi_text, dic_unknown, text_size, known, maybe =\
-                        lexer.analyze(i_file)
-            except Exception:
-                logging.exception(e)
-                pass
-
-            if text_size is not None:  # Analysis was successful
-                rowid = self.storage.stat_changed(
-                        language, project, file, text_size, known, maybe)
-
-                if rowid != -1:
-                    self.storage.update_stat(rowid,
-                        language, project, file, text_size, known, maybe)
-                    self.storage.update_words(
-                        language, project, file, dic_unknown)
-
-                # Save marked text to output dir
-                base, ext = os.path.splitext(file)
-                out_path =\
-                    os.path.join(output_dir, base + config.input[ext])
-
-                if not os.path.exists(out_path) or rowid != -1:
-                    css = fetch_css_file(language)
-                    html_page = printer.print_page(file, lexi_text, style=css)
-                    logging.info("Writing output to:" + out_path)
-                    try:
-                        with open(out_path, 'w', encoding='utf-8') as a_file:
-                            a_file.write(html_page)
-                    except Exception:
-                        logging.exception(e)
-                        pass
-
-            # Update progressbar
-            new_value = progress.value() + step
-            progress.setValue(new_value)
-            QApplication.processEvents()
-            if progress.wasCanceled():
-                break
+        if worker.base is not None:
+            self.lexers.give_back(language, worker.base, self.lexer_version)
 
-        # Close progress bar
-        old_known, old_maybe = self.storage.get_total_stats(language, project)
+        old_known, old_maybe = self.old_stats
         if not old_known:
             old_known = 0
         if not old_maybe:
             old_maybe = 0
-        self.storage.batch_update_words()
-        self.storage.batch_update_stats()
+        try:
+            with self.storage.transaction(bulk=True):
+                self.storage.batch_update_stats()
+                self.storage.batch_update_words()
+                self.storage.batch_update_fingerprints()
+        except Exception as e:
+            # Results of the run are lost, the next run brings them back
+            logging.exception(e)
+            self.storage.discard_updates()
+        self.runProject.setEnabled(True)
+        self.project_worker = None
+        self.stats_index = None
+
+        self.projectIsReady.emit()
+
+        progress, self.progress = self.progress, None
+        if progress is None:  # Auto analysis
+            self.analyze_queued()
+            return
+
+        # Close progress bar
         progress.setValue(10000)
         progress.close()
         self.menuBar.setEnabled(True)
 
-        self.projectIsReady.emit()
-
         new_known, new_maybe = self.storage.get_total_stats(language, project)
         if not new_known:
             new_known = 0
@@ -725,6 +1051,7 @@ class MainWindow(Ui_MainWindow, QMainWindow):
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Worker processes in frozen app
     log_name = os.path.join(app_data_path, config.log)
 
     logging.basicConfig(
@@ -741,7 +1068,8 @@ if __name__ == '__main__':
         watcher = Watcher()
         dic_watcher = Watcher()
         storage = storage.Storage(os.path.join(app_data_path, config.dbname))
-        form = MainWindow(watcher, dic_watcher, storage)
+        cache = DictionaryCache(os.path.join(app_data_path, config.cache_dir))
+        form = MainWindow(watcher, dic_watcher, storage, cache)
 
         form.show()
 
@@ -40,9 +40,7 @@ class LangManager(Ui_languagesDialog, QDialog):
         Draws the existing languages into table.
         :return:
         """
-        languages = self.storage.get_languages()
-        for row in languages:
-            self.langs_model.add_row(*row)
+        self.langs_model.set_rows(self.storage.get_languages())
 
     def remove_button_clicked(self):
         """
@@ -1,5 +1,157 @@
 # -*- coding: utf-8 -*-
 import sqlite3
+import logging
+import re
+from contextlib import contextmanager
+
+# Journaling used while the large batch of changes is written. WAL stays on
+# once it's set, synchronous level is restored after the batch.
+BULK_JOURNAL_MODE = "WAL"
+BULK_SYNCHRONOUS = "NORMAL"
+
+# Every migration brings the schema to the next version. The version of DB
+# is kept in user_version pragma, DB made before migrations has version 0.
+MIGRATIONS = [
+    # 1. Initial tables
+    ["""CREATE TABLE IF NOT EXISTS Languages(
+     lang TEXT, directory TEXT)""",
+     """CREATE TABLE IF NOT EXISTS Files(
+     name TEXT, lang TEXT, project TEXT, size INTEGER, known INTEGER,
+     pknown REAL, maybe INTEGER, pmaybe REAL, unknown INTEGER,
+     punknown REAL)""",
+     """CREATE TABLE IF NOT EXISTS Words(
+     word TEXT, lang TEXT, project TEXT, file TEXT, quantity INTEGER)""",
+     """CREATE TABLE IF NOT EXISTS Fingerprints(
+     name TEXT, lang TEXT, project TEXT, mtime REAL, size INTEGER,
+     digest TEXT, generation TEXT)"""],
+    # 2. Keys and indexes for the queries by language, project and file
+    ["""DELETE FROM Languages WHERE rowid NOT IN (
+     SELECT MIN(rowid) FROM Languages GROUP BY lang)""",
+     """DELETE FROM Files WHERE rowid NOT IN (
+     SELECT MIN(rowid) FROM Files GROUP BY lang, project, name)""",
+     """DELETE FROM Words WHERE rowid NOT IN (
+     SELECT MIN(rowid) FROM Words GROUP BY lang, project, file, word)""",
+     """DELETE FROM Fingerprints WHERE rowid NOT IN (
+     SELECT MIN(rowid) FROM Fingerprints GROUP BY lang, project, name)""",
+     """CREATE UNIQUE INDEX IF NOT EXISTS LanguagesKey
+     ON Languages(lang)""",
+     """CREATE UNIQUE INDEX IF NOT EXISTS FilesKey
+     ON Files(lang, project, name)""",
+     """CREATE UNIQUE INDEX IF NOT EXISTS WordsKey
+     ON Words(lang, project, file, word)""",
+     """CREATE INDEX IF NOT EXISTS WordsByWord
+     ON Words(lang, project, word, quantity)""",
+     """CREATE UNIQUE INDEX IF NOT EXISTS FingerprintsKey
+     ON Fingerprints(lang, project, name)"""],
+    # 3. Projects, files and words are stored once and referenced by id
+    ["""CREATE TABLE Projects(
+     id INTEGER PRIMARY KEY, lang TEXT, name TEXT, UNIQUE(lang, name))""",
+     """INSERT INTO Projects(lang, name)
+     SELECT DISTINCT lang, project FROM Files""",
+     """ALTER TABLE Files RENAME TO OldFiles""",
+     """CREATE TABLE Files(
+     id INTEGER PRIMARY KEY, project_id INTEGER, name TEXT, size INTEGER,
+     known INTEGER, pknown REAL, maybe INTEGER, pmaybe REAL,
+     unknown INTEGER, punknown REAL, UNIQUE(project_id, name))""",
+     """INSERT INTO Files
+     SELECT O.rowid, P.id, O.name, O.size, O.known, O.pknown, O.maybe,
+     O.pmaybe, O.unknown, O.punknown
+     FROM OldFiles O INNER JOIN Projects P
+     ON P.lang = O.lang AND P.name = O.project""",
+     """CREATE TABLE Vocabulary(
+     id INTEGER PRIMARY KEY, word TEXT UNIQUE)""",
+     """INSERT INTO Vocabulary(word) SELECT DISTINCT word FROM Words""",
+     """ALTER TABLE Words RENAME TO OldWords""",
+     """CREATE TABLE Words(
+     file_id INTEGER, word_id INTEGER, quantity INTEGER,
+     PRIMARY KEY(file_id, word_id)) WITHOUT ROWID""",
+     # Words of the files without stats are dropped
+     """INSERT INTO Words
+     SELECT F.id, V.id, O.quantity
+     FROM OldWords O
+     INNER JOIN Projects P ON P.lang = O.lang AND P.name = O.project
+     INNER JOIN Files F ON F.project_id = P.id AND F.name = O.file
+     INNER JOIN Vocabulary V ON V.word = O.word""",
+     """DROP TABLE OldWords""",
+     """DROP TABLE OldFiles""",
+     """CREATE INDEX WordsByWord ON Words(word_id)""",
+     """DELETE FROM Vocabulary WHERE id NOT IN (
+     SELECT word_id FROM Words)"""],
+    # 4. Quantities of words in the whole project kept up to date by triggers
+    ["""CREATE TABLE ProjectWords(
+     project_id INTEGER, word_id INTEGER, quantity INTEGER,
+     PRIMARY KEY(project_id, word_id)) WITHOUT ROWID""",
+     """CREATE INDEX ProjectWordsByQuantity
+     ON ProjectWords(project_id, quantity)""",
+     """INSERT INTO ProjectWords
+     SELECT F.project_id, W.word_id, SUM(W.quantity)
+     FROM Words W INNER JOIN Files F ON F.id = W.file_id
+     GROUP BY F.project_id, W.word_id""",
+     """CREATE TRIGGER WordsInserted AFTER INSERT ON Words
+     BEGIN
+      INSERT OR IGNORE INTO ProjectWords
+      SELECT project_id, NEW.word_id, 0 FROM Files WHERE id = NEW.file_id;
+      UPDATE ProjectWords SET quantity = quantity + NEW.quantity
+      WHERE word_id = NEW.word_id AND project_id =
+      (SELECT project_id FROM Files WHERE id = NEW.file_id);
+     END""",
+     # Words must be deleted before the file they belong to
+     """CREATE TRIGGER WordsDeleted AFTER DELETE ON Words
+     BEGIN
+      UPDATE ProjectWords SET quantity = quantity - OLD.quantity
+      WHERE word_id = OLD.word_id AND project_id =
+      (SELECT project_id FROM Files WHERE id = OLD.file_id);
+      DELETE FROM ProjectWords
+      WHERE word_id = OLD.word_id AND quantity <= 0 AND project_id =
+      (SELECT project_id FROM Files WHERE id = OLD.file_id);
+     END"""],
+    # 5. Quantities of words are updated in place
+    ["""CREATE TRIGGER WordsUpdated AFTER UPDATE OF quantity ON Words
+     BEGIN
+      UPDATE ProjectWords SET quantity = quantity - OLD.quantity + NEW.quantity
+      WHERE word_id = NEW.word_id AND project_id =
+      (SELECT project_id FROM Files WHERE id = NEW.file_id);
+     END"""],
+]
+
+# Trigram index of Vocabulary for the files filter. It's optional, SQLite
+# might be built without FTS5, so it's not a part of migrations.
+WORD_INDEX = """CREATE VIRTUAL TABLE WordIndex
+ USING fts5(word, tokenize='trigram', detail='none')"""
+
+# Subquery that gives the id of file by language, project and name
+FILE_ID = """(SELECT F.id FROM Files F INNER JOIN Projects P
+ ON P.id = F.project_id WHERE P.lang=? AND P.name=? AND F.name=?)"""
+
+
+class StatsIndex:
+    """
+    Stats of every file of the project loaded at once, so the changes can
+    be checked without querying DB for each file.
+    """
+
+    def __init__(self, rows):
+        self.stats = {name: (rowid, [size, known, maybe])
+                      for name, rowid, size, known, maybe in rows}
+
+    def changed(self, name, size, known, maybe):
+        """
+        Checks if the statistics of the given file has changed.
+        :param name:
+        :param size:
+        :param known:
+        :param maybe:
+        :return: -1 if it's unchanged, 0 if there is no record for given
+        file, rowid - if there is the record and stats has changed.
+        """
+        if name not in self.stats:
+            return 0  # No record has been found
+
+        rowid, stats = self.stats[name]
+        if stats == [size, known, maybe]:
+            return -1  # Stats unchanged
+        else:
+            return rowid  # Stats changed
 
 
 class Storage():
@@ -10,24 +162,104 @@ class Storage():
 
         # Initialize tables
         self.db_cursor = self.db_conn.cursor()
-        self.db_cursor.execute("""CREATE TABLE IF NOT EXISTS Languages(
-        lang TEXT, directory TEXT)""")
-        self.db_conn.commit()
-
-        self.db_cursor.execute("""CREATE TABLE IF NOT EXISTS Files(
-        name TEXT, lang TEXT, project TEXT, size INTEGER, known INTEGER,
-        pknown REAL, maybe INTEGER, pmaybe REAL, unknown INTEGER,
-        punknown REAL)""")
-        self.db_conn.commit()
-
-        self.db_cursor.execute("""CREATE TABLE IF NOT EXISTS Words(
-        word TEXT, lang TEXT, project TEXT, file TEXT, quantity INTEGER)""")
-        self.db_conn.commit()
+        self.depth = 0
+        self.__migrate()
+        self.word_index = self.__create_word_index()
 
         self.words = []
-        self.new_words = []
         self.to_insert = []
         self.to_update = []
+        self.fingerprints = []
+
+    def __migrate(self):
+        """
+        Upgrades the schema of DB to the latest version.
+        """
+        self.db_cursor.execute("PRAGMA user_version")
+        version = self.db_cursor.fetchone()[0]
+        # DB made before migrations has version 0, but it has tables
+        self.db_cursor.execute("""SELECT count(*) FROM sqlite_master
+        WHERE type='table'""")
+        has_tables = self.db_cursor.fetchone()[0] > 0
+        for number in range(version, len(MIGRATIONS)):
+            with self.transaction():
+                for statement in MIGRATIONS[number]:
+                    self.db_cursor.execute(statement)
+                self.db_cursor.execute(
+                    "PRAGMA user_version = {0}".format(number + 1))
+
+        if has_tables and version < len(MIGRATIONS):
+            # Give the space freed by migrations back to the file system
+            self.db_cursor.execute("VACUUM")
+
+    def __create_word_index(self):
+        """
+        Creates the trigram index of words if SQLite supports it.
+        :return: True if the index can be used
+        """
+        self.db_cursor.execute("""SELECT name FROM sqlite_master
+        WHERE name='WordIndex'""")
+        if self.db_cursor.fetchone():
+            return True
+
+        try:
+            with self.transaction():
+                self.db_cursor.execute(WORD_INDEX)
+                self.__sync_word_index()
+        except sqlite3.OperationalError as e:
+            logging.info("Trigram index is not available:" + str(e))
+            return False
+        return True
+
+    def __sync_word_index(self):
+        """
+        Brings the trigram index in line with Vocabulary. Ids of words only
+        grow unless the words are removed, so the new ones are found by id.
+        """
+        self.db_cursor.execute("""DELETE FROM WordIndex
+        WHERE rowid NOT IN (SELECT id FROM Vocabulary)""")
+        self.db_cursor.execute("""INSERT INTO WordIndex(rowid, word)
+        SELECT id, word FROM Vocabulary
+        WHERE id > IFNULL((SELECT rowid FROM WordIndex
+        ORDER BY rowid DESC LIMIT 1), 0)""")
+
+    @contextmanager
+    def transaction(self, bulk=False):
+        """
+        Groups the changes made inside the block into one transaction. It's
+        committed when the outermost block exits and rolled back if it
+        exits with an exception. Blocks can be nested.
+        :param bulk: relaxes journaling for the outermost block, one commit
+        of the large batch costs one fsync.
+        :return:
+        """
+        bulk = bulk and self.depth == 0
+        if bulk:
+            self.db_cursor.execute("PRAGMA synchronous")
+            synchronous = self.db_cursor.fetchone()[0]
+            self.db_cursor.execute(
+                "PRAGMA journal_mode = {0}".format(BULK_JOURNAL_MODE))
+            self.db_cursor.execute(
+                "PRAGMA synchronous = {0}".format(BULK_SYNCHRONOUS))
+
+        self.depth += 1
+        try:
+            if self.depth == 1 and not self.db_conn.in_transaction:
+                # sqlite3 begins the transaction implicitly only before DML,
+                # the schema changes would be committed one by one
+                self.db_cursor.execute("BEGIN")
+            yield
+            if self.depth == 1:
+                self.db_conn.commit()
+        except Exception:
+            if self.depth == 1:
+                self.db_conn.rollback()
+            raise
+        finally:
+            self.depth -= 1
+            if bulk:
+                self.db_cursor.execute(
+                    "PRAGMA synchronous = {0}".format(synchronous))
 
     def add_language(self, lang, folder):
         """
@@ -36,30 +268,35 @@ class Storage():
         :param folder:
         :return:
         """
-        db_cursor = self.db_conn.cursor()
-        db_cursor.execute('''INSERT INTO Languages
-         VALUES (?, ?)''', (lang, folder))
-        self.db_conn.commit()
+        with self.transaction():
+            self.db_cursor.execute('''INSERT INTO Languages
+             VALUES (?, ?)''', (lang, folder))
 
     def batch_update_stats(self):
         """
         Applies the changes and updates the stats for projects given
-        before.
+        before. Changes are dropped if the batch fails.
         :return:
         """
-        db_cursor = self.db_conn.cursor()
-        db_cursor.executemany('''INSERT INTO Files
-            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                              self.to_insert)
-        self.db_conn.commit()
-        self.to_insert = []
-
-        db_cursor.executemany('''UPDATE Files
-            SET size=?, known=?, pknown=?, maybe=?, pmaybe=?, unknown=?,
-            punknown=?
-            WHERE rowid =?''', self.to_update)
-        self.db_conn.commit()
-        self.to_update = []
+        to_insert, self.to_insert = self.to_insert, []
+        to_update, self.to_update = self.to_update, []
+        with self.transaction():
+            self.db_cursor.executemany('''INSERT OR IGNORE
+                INTO Projects(lang, name) VALUES(?, ?)''',
+                                       [(language, project) for
+                                        _, language, project, *_
+                                        in to_insert])
+            self.db_cursor.executemany('''INSERT INTO Files
+                SELECT NULL, id, ?, ?, ?, ?, ?, ?, ?, ? FROM Projects
+                WHERE lang=? AND name=?''',
+                                       [(file, *stats, language, project)
+                                        for file, language, project, *stats
+                                        in to_insert])
+
+            self.db_cursor.executemany('''UPDATE Files
+                SET size=?, known=?, pknown=?, maybe=?, pmaybe=?, unknown=?,
+                punknown=?
+                WHERE rowid =?''', to_update)
 
     def update_stat(self, rowid, language, project, file, text_size,
                     known, maybe):
@@ -73,7 +310,7 @@ class Storage():
         :param text_size:
         :param known:
         :param maybe:
-        :return:
+        :return: stats of the file as they are stored
         """
         pknown = 0.0
         pmaybe = 0.0
@@ -91,24 +328,56 @@ class Storage():
             self.to_update.append((text_size, known, pknown, maybe, pmaybe,
                                    unknown, punknown, rowid))
 
+        return text_size, known, pknown, maybe, pmaybe, unknown, punknown
+
     def batch_update_words(self):
         """
         Applies the changes and updates the word lists for projects given
-        before.
+        before. Stats of the files must be updated beforehand, the words of
+        the files removed meanwhile are dropped. Changes are dropped if the
+        batch fails.
         :return:
         """
-        # Clear old unknown words data
-        db_cursor = self.db_conn.cursor()
-        db_cursor.executemany('''DELETE FROM Words
-        WHERE lang=? AND project=? AND file=?''', self.words)
-        self.db_conn.commit()
-        self.words = []
-
-        # Set new data
-        db_cursor.executemany('''INSERT INTO Words
-        VALUES(?, ?, ?, ?, ?)''', self.new_words)
-        self.db_conn.commit()
-        self.new_words = []
+        words, self.words = self.words, []
+        with self.transaction():
+            for language, project, file, dic_unknown in words:
+                self.db_cursor.execute("SELECT " + FILE_ID,
+                                       (language, project, file))
+                file_id, = self.db_cursor.fetchone()
+                if file_id is None:  # File has been removed during analysis
+                    continue
+
+                self.db_cursor.execute('''SELECT V.word, W.word_id,
+                W.quantity FROM Words W
+                INNER JOIN Vocabulary V ON V.id = W.word_id
+                WHERE W.file_id=?''', (file_id, ))
+                stored = {word: (word_id, quantity) for word, word_id, quantity
+                          in self.db_cursor.fetchall()}
+
+                # Apply only the difference with stored data
+                to_delete = [(file_id, word_id) for word, (word_id, _)
+                             in stored.items() if word not in dic_unknown]
+                to_update = [(quantity, file_id, stored[word][0])
+                             for word, quantity in dic_unknown.items()
+                             if word in stored and
+                             stored[word][1] != quantity]
+                to_insert = [(word, quantity)
+                             for word, quantity in dic_unknown.items()
+                             if word not in stored]
+
+                self.db_cursor.executemany('''DELETE FROM Words
+                WHERE file_id=? AND word_id=?''', to_delete)
+                self.db_cursor.executemany('''UPDATE Words SET quantity=?
+                WHERE file_id=? AND word_id=?''', to_update)
+                self.db_cursor.executemany('''INSERT OR IGNORE
+                INTO Vocabulary(word) VALUES(?)''',
+                                           [(word, ) for word, _ in to_insert])
+                self.db_cursor.executemany('''INSERT INTO Words
+                SELECT ?, id, ? FROM Vocabulary WHERE word=?''',
+                                           [(file_id, quantity, word)
+                                            for word, quantity in to_insert])
+            if self.word_index:
+                self.__sync_word_index()
 
     def update_words(self, language, project, file, dic_unknown):
         """
@@ -120,13 +389,59 @@ class Storage():
         :param dic_unknown:
         :return:
         """
-        # Save data that should be deleted in memory
-        self.words.append((language, project, file))
-
         # Save new data in memory
-        records = [(word, language, project, file, quantity)
-                   for word, quantity in dic_unknown.items()]
-        self.new_words += records
+        self.words.append((language, project, file, dic_unknown))
+
+    def batch_update_fingerprints(self):
+        """
+        Applies the changes and updates the fingerprints of files given
+        before. Changes are dropped if the batch fails.
+        :return:
+        """
+        fingerprints, self.fingerprints = self.fingerprints, []
+        with self.transaction():
+            self.db_cursor.executemany('''INSERT OR REPLACE INTO Fingerprints
+            VALUES(?, ?, ?, ?, ?, ?, ?)''', fingerprints)
+
+    def discard_updates(self):
+        """
+        Drops the changes given by update_stat, update_words and
+        update_fingerprint that have not been applied yet.
+        """
+        self.to_insert = []
+        self.to_update = []
+        self.words = []
+        self.fingerprints = []
+
+    def update_fingerprint(self, language, project, file, mtime, size,
+                           digest, generation):
+        """
+        Updates the fingerprint of the given file. Delayed insert is used.
+        Batch_update_fingerprints must be called afterward to apply changes.
+        :param language:
+        :param project:
+        :param file:
+        :param mtime: modification time of the file
+        :param size: size of the file in bytes
+        :param digest: hash of the file content
+        :param generation: id of the dictionaries used for analysis
+        :return:
+        """
+        self.fingerprints.append((file, language, project, mtime, size,
+                                  digest, generation))
+
+    def get_fingerprints(self, language, project):
+        """
+        Provides the fingerprints of files of the given project.
+        :param language:
+        :param project:
+        :return: dict name -> (mtime, size, digest, generation)
+        """
+        db_cursor = self.db_conn.cursor()
+        db_cursor.execute("""SELECT name, mtime, size, digest, generation
+        FROM Fingerprints WHERE lang=? AND project=?""", (language, project))
+        return {name: tuple(fingerprint)
+                for name, *fingerprint in db_cursor.fetchall()}
 
     def language_exists(self, lang):
         """
@@ -169,8 +484,10 @@ class Storage():
         file, rowid - if there is the record and stats has changed.
         """
         db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""SELECT rowid, size, known, maybe FROM Files WHERE
-         lang=? AND project=? AND name=?""", (language, project, name))
+        db_cursor.execute("""SELECT F.id, F.size, F.known, F.maybe
+         FROM Files F INNER JOIN Projects P ON P.id = F.project_id
+         WHERE P.lang=? AND P.name=? AND F.name=?""",
+                          (language, project, name))
         result = db_cursor.fetchone()
         if result:
             rowid, *stats = result
@@ -181,6 +498,19 @@ class Storage():
         else:
             return 0  # No record has been found
 
+    def get_stats_index(self, language, project):
+        """
+        Loads the stats of every file of the given project.
+        :param language:
+        :param project:
+        :return: StatsIndex
+        """
+        db_cursor = self.db_conn.cursor()
+        db_cursor.execute("""SELECT F.name, F.id, F.size, F.known, F.maybe
+         FROM Files F INNER JOIN Projects P ON P.id = F.project_id
+         WHERE P.lang=? AND P.name=?""", (language, project))
+        return StatsIndex(db_cursor.fetchall())
+
     def get_languages(self):
         """
         Provides list of pairs [language, project].
@@ -194,9 +524,9 @@ class Storage():
         Return projects for chosen language.
         """
         db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""SELECT project FROM Files
+        db_cursor.execute("""SELECT name FROM Projects
         WHERE lang=?
-        GROUP BY project""", (language, ))
+        ORDER BY name""", (language, ))
         return [x[0] for x in db_cursor.fetchall()]
 
     def get_unknown_words(self, language, project):
@@ -207,10 +537,10 @@ class Storage():
         :param project:
         """
         db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""SELECT word, SUM(quantity) as sum FROM Words
-        WHERE lang=? AND project=?
-        GROUP BY word
-        ORDER BY sum DESC
+        db_cursor.execute("""SELECT V.word, W.quantity FROM ProjectWords W
+        INNER JOIN Vocabulary V ON V.id = W.word_id
+        WHERE W.project_id=(SELECT id FROM Projects WHERE lang=? AND name=?)
+        ORDER BY W.quantity DESC
         LIMIT 100""", (language, project))
         return db_cursor.fetchall()
 
@@ -223,11 +553,85 @@ class Storage():
         :param file
         """
         db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""SELECT word, quantity FROM Words
-        WHERE lang=? AND project=? AND file=?
-        ORDER BY quantity DESC""", (language, project, file))
+        db_cursor.execute("""SELECT V.word, W.quantity FROM Words W
+        INNER JOIN Vocabulary V ON V.id = W.word_id
+        WHERE W.file_id=""" + FILE_ID + """
+        ORDER BY W.quantity DESC""", (language, project, file))
+        return db_cursor.fetchall()
+
+    def get_unknown_words_page(self, language, project, file, column,
+                               descending, after, limit):
+        """
+        Provides one page of unknown words and theirs quantities for given
+        language and project or file. Pages are sorted by given column and
+        the next page starts after the last row of previous one.
+        :param language:
+        :param project:
+        :param file: None for the words of whole project
+        :param column: 0 - sort by word, 1 - sort by quantity
+        :param descending:
+        :param after: last row of previous page or None for the first page
+        :param limit: size of page
+        :return: list of (word, quantity, word_id)
+        """
+        if file is None:
+            source = """ProjectWords W WHERE W.project_id=
+            (SELECT id FROM Projects WHERE lang=? AND name=?)"""
+            params = [language, project]
+        else:
+            source = "Words W WHERE W.file_id=" + FILE_ID
+            params = [language, project, file]
+
+        direction = "DESC" if descending else "ASC"
+        operator = "<" if descending else ">"
+        if column == 0:
+            order = "V.word {0}".format(direction)
+            key = "V.word {0} ?".format(operator)
+            key_params = after[:1] if after else ()
+        else:  # Ties are sorted by the id of word to keep the key unique
+            order = "W.quantity {0}, W.word_id {0}".format(direction)
+            key = "(W.quantity, W.word_id) {0} (?, ?)".format(operator)
+            key_params = after[1:3] if after else ()
+
+        db_cursor = self.db_conn.cursor()
+        db_cursor.execute("""SELECT V.word, W.quantity, W.word_id
+        FROM Vocabulary V INNER JOIN """ + source + """
+        AND V.id = W.word_id""" + (" AND " + key if after else "") + """
+        ORDER BY """ + order + """
+        LIMIT ?""", params + list(key_params) + [limit])
         return db_cursor.fetchall()
 
+    def __words_like(self, pattern):
+        """
+        Builds the query for ids of words that match LIKE pattern. The
+        pattern that is a word or a prefix is looked up in the index of
+        Vocabulary, the pattern with at least three letters in a row is
+        looked up in the trigram index, if there is one. Other patterns
+        are checked against every word of Vocabulary.
+        :param pattern:
+        :return: query, params
+        """
+        # LIKE ignores the case of ASCII letters only
+        exact = not re.search(r"[a-zA-Z]", pattern)
+        prefix = pattern[:-1] if pattern.endswith("%") else pattern
+        if exact and prefix and not re.search(r"[%_]", prefix):
+            if prefix == pattern:
+                return "SELECT id FROM Vocabulary WHERE word=?", (prefix, )
+            if ord(prefix[-1]) not in (0xD7FF, 0x10FFFF):
+                upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                return ("SELECT id FROM Vocabulary WHERE word>=? AND word<?",
+                        (prefix, upper))
+
+        literal = max(re.split(r"[%_]", pattern), key=len)
+        if self.word_index and len(literal) >= 3:
+            # Index is searched for the longest literal part of pattern,
+            # the LIKE checks the whole pattern and the case of letters.
+            return ("""SELECT id FROM Vocabulary WHERE word LIKE ? AND id IN
+            (SELECT rowid FROM WordIndex WHERE word LIKE ?)""",
+                    (pattern, "%" + literal + "%"))
+
+        return "SELECT id FROM Vocabulary WHERE word LIKE ?", (pattern, )
+
     def get_files_stats(self, language, project, filter_value):
         """
         Provides the list of files and corresponding stats for given
@@ -239,21 +643,19 @@ class Storage():
         """
         db_cursor = self.db_conn.cursor()
         if filter_value:
+            words, params = self.__words_like(filter_value)
             db_cursor.execute("""SELECT F.name, F.size, F.known, F.pknown,
              F.maybe, F.pmaybe, F.unknown, F.punknown
-             FROM (SELECT * from Files WHERE lang=:lang AND project=:prj) F
-             INNER JOIN (SELECT * FROM Words WHERE lang=:lang
-             AND project=:prj AND word LIKE :like) W
-             ON F.name = W.file
-             GROUP BY F.name
-             ORDER BY F.punknown DESC""", {'lang': language,
-                                           'prj': project,
-                                           'like': filter_value})
+             FROM Files F INNER JOIN Projects P ON P.id = F.project_id
+             WHERE P.lang=? AND P.name=? AND F.id IN
+             (SELECT file_id FROM Words WHERE word_id IN (""" + words + """))
+             ORDER BY F.punknown DESC""", (language, project) + params)
         else:
-            db_cursor.execute("""SELECT name, size, known, pknown, maybe, pmaybe,
-             unknown, punknown FROM Files WHERE
-             lang=? AND project=?
-             ORDER BY punknown DESC""", (language, project))
+            db_cursor.execute("""SELECT F.name, F.size, F.known, F.pknown,
+             F.maybe, F.pmaybe, F.unknown, F.punknown
+             FROM Files F INNER JOIN Projects P ON P.id = F.project_id
+             WHERE P.lang=? AND P.name=?
+             ORDER BY F.punknown DESC""", (language, project))
         return db_cursor.fetchall()
 
     def get_total_stats(self, language, project):
@@ -264,8 +666,9 @@ class Storage():
         :return:
         """
         db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""SELECT SUM(known), SUM(maybe) FROM Files
-         WHERE lang=? AND project=?""", (language, project))
+        db_cursor.execute("""SELECT SUM(F.known), SUM(F.maybe)
+         FROM Files F INNER JOIN Projects P ON P.id = F.project_id
+         WHERE P.lang=? AND P.name=?""", (language, project))
         return db_cursor.fetchone()
 
     def remove_file(self, name, language, project):
@@ -276,14 +679,22 @@ class Storage():
         :param project:
         :return:
         """
-        db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""DELETE FROM Files WHERE
-        name=? AND lang=? AND project=?""", (name, language, project))
-        self.db_conn.commit()
+        with self.transaction():
+            self.db_cursor.execute("""DELETE FROM Words
+            WHERE file_id=""" + FILE_ID, (language, project, name))
+
+            self.db_cursor.execute("""DELETE FROM Files
+            WHERE id=""" + FILE_ID, (language, project, name))
+
+            self.db_cursor.execute("""DELETE FROM Fingerprints
+            WHERE name=? AND lang=? AND project=?""",
+                                   (name, language, project))
 
-        db_cursor.execute("""DELETE FROM Words
-        WHERE lang=? AND project=? and file=?""", (language, project, name))
-        self.db_conn.commit()
+    def __remove_unused_words(self):
+        self.db_cursor.execute("""DELETE FROM Vocabulary
+        WHERE id NOT IN (SELECT word_id FROM Words)""")
+        if self.word_index:
+            self.__sync_word_index()
 
     def remove_language(self, language):
         """
@@ -291,18 +702,25 @@ class Storage():
         :param language:
         :return:
         """
-        db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""DELETE FROM Languages
-        WHERE lang=?""", (language, ))
-        self.db_conn.commit()
+        with self.transaction():
+            self.db_cursor.execute("""DELETE FROM Languages
+            WHERE lang=?""", (language, ))
+
+            self.db_cursor.execute("""DELETE FROM Words
+            WHERE file_id IN (SELECT F.id FROM Files F INNER JOIN Projects P
+            ON P.id = F.project_id WHERE P.lang=?)""", (language, ))
+
+            self.db_cursor.execute("""DELETE FROM Files
+            WHERE project_id IN (SELECT id FROM Projects WHERE lang=?)""",
+                                   (language, ))
 
-        db_cursor.execute("""DELETE FROM Files
-        WHERE lang=?""", (language, ))
-        self.db_conn.commit()
+            self.db_cursor.execute("""DELETE FROM Projects
+            WHERE lang=?""", (language, ))
 
-        db_cursor.execute("""DELETE FROM Words
-        WHERE lang=?""", (language, ))
-        self.db_conn.commit()
+            self.db_cursor.execute("""DELETE FROM Fingerprints
+            WHERE lang=?""", (language, ))
+
+            self.__remove_unused_words()
 
     def remove_project(self, lang, project):
         """
@@ -311,11 +729,20 @@ class Storage():
         :param project:
         :return:
         """
-        db_cursor = self.db_conn.cursor()
-        db_cursor.execute("""DELETE FROM Files
-        WHERE lang=? AND project=?""", (lang, project))
-        self.db_conn.commit()
+        with self.transaction():
+            self.db_cursor.execute("""DELETE FROM Words
+            WHERE file_id IN (SELECT F.id FROM Files F INNER JOIN Projects P
+            ON P.id = F.project_id WHERE P.lang=? AND P.name=?)""",
+                                   (lang, project))
+
+            self.db_cursor.execute("""DELETE FROM Files
+            WHERE project_id IN (SELECT id FROM Projects
+            WHERE lang=? AND name=?)""", (lang, project))
+
+            self.db_cursor.execute("""DELETE FROM Projects
+            WHERE lang=? AND name=?""", (lang, project))
+
+            self.db_cursor.execute("""DELETE FROM Fingerprints
+            WHERE lang=? AND project=?""", (lang, project))
 
-        db_cursor.execute("""DELETE FROM Words
-        WHERE lang=? AND project=?""", (lang, project))
-        self.db_conn.commit()
+            self.__remove_unused_words()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import json
+import io
+import tempfile
+from lang.lexer import Lexer
+from lang.analyzer import Analyzer, analyze_file
+from lang.cache import file_digest
+import lang.printer as printer
+
+
+class AnalyzerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lexer = Lexer()
+        plugin_name = os.path.join(os.getcwd(), 'plugins', 'Hebrew.json')
+        with open(plugin_name, "r") as file:
+            self.lexer.load_plugin(json.loads(file.read()))
+        self.lexer.load_dictionary(io.StringIO('כלב'))
+        self.lexer.expand_dic()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def task(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return name, path, path + '.html', ''
+
+    def test_results_are_ordered(self):
+        tasks = [self.task('{0}.txt'.format(i), 'הכלב חתול ' * i)
+                 for i in range(1, 6)]
+        analyzer = Analyzer(self.lexer, 2)
+        results = list(analyzer.imap(tasks))
+        analyzer.close()
+        self.assertEqual([task[0] for task in tasks],
+                         [result[0] for result in results])
+        self.assertEqual((6, 0, 3),
+                         results[2][2:5])
+        self.assertEqual({'חתול': 3}, results[2][1])
+
+    def test_page_is_written(self):
+        task = self.task('a.txt', 'כלב')
+        analyzer = Analyzer(self.lexer, 1)
+        list(analyzer.imap([task]))
+        analyzer.close()
+        with open(task[2], 'r', encoding='utf-8') as file:
+            page = file.read()
+        expected = printer.print_page(
+            'a.txt', [('כלב', {'type': 'word', 'class': 'known'})])
+        self.assertEqual(expected, page)
+
+    def test_missing_file(self):
+        analyzer = Analyzer(self.lexer, 1)
+        name, path, out_path, css = self.task('a.txt', '')
+        results = list(analyzer.imap([('b.txt', path + 'x', out_path, css)]))
+        analyzer.close()
+        self.assertIsNone(results[0][2])
+
+    def test_digest_of_file(self):
+        task = self.task('a.txt', 'כלב')
+        analyzer = Analyzer(self.lexer, 1)
+        results = list(analyzer.imap([task]))
+        analyzer.close()
+        self.assertEqual(file_digest(task[1]), results[0][5])
+
+    def test_same_result_without_pool(self):
+        tasks = [self.task('{0}.txt'.format(i), 'הכלב חתול ' * i)
+                 for i in range(1, 4)]
+        analyzer = Analyzer(self.lexer, 2)
+        expected = list(analyzer.imap(tasks))
+        analyzer.close()
+        self.assertEqual(expected,
+                         [analyze_file(self.lexer, task) for task in tasks])
+
+    def test_canceled_in_the_middle_of_file(self):
+        task = self.task('a.txt', 'הכלב חתול ' * 10000)
+        checks = []
+
+        def canceled():
+            checks.append(1)
+            return len(checks) > 1
+
+        result = analyze_file(self.lexer, task, canceled)
+        self.assertEqual(2, len(checks))
+        self.assertIsNone(result[2])
@@ -0,0 +1,158 @@
+import unittest
+import os
+import json
+import pickle
+import tempfile
+from lang.lexer import Lexer
+from lang.cache import DictionaryCache
+from lang.frozen import FrozenDictionary
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.plugin_path = os.path.join(os.getcwd(), 'plugins', 'Hebrew.json')
+        self.dic_path = os.path.join(self.tmp.name, 'dic.txt')
+        self.write_dic('כלב\n')
+        self.cache = DictionaryCache(os.path.join(self.tmp.name, 'cache'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_dic(self, content):
+        with open(self.dic_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+    def build(self):
+        lexer = Lexer()
+        with open(self.plugin_path, 'r') as file:
+            lexer.load_plugin(json.loads(file.read()))
+        hit = self.cache.build(lexer, ('Hebrew', 'project'),
+                               self.plugin_path, [self.dic_path])
+        return lexer, hit
+
+    def test_first_build_is_a_miss(self):
+        lexer, hit = self.build()
+        self.assertFalse(hit)
+        self.assertIn('כלבים', lexer.dic)
+
+    def test_second_build_is_a_hit(self):
+        first, _ = self.build()
+        second, hit = self.build()
+        self.assertTrue(hit)
+        self.assertEqual(first.dic, second.dic)
+
+    def test_changed_dictionary_is_rebuilt(self):
+        self.build()
+        self.write_dic('כלב\nחתול\n')
+        lexer, hit = self.build()
+        self.assertFalse(hit)
+        self.assertIn('חתולים', lexer.dic)
+
+    def test_other_project_is_a_miss(self):
+        self.build()
+        lexer = Lexer()
+        hit = self.cache.build(lexer, ('Hebrew', 'other'),
+                               self.plugin_path, [self.dic_path])
+        self.assertFalse(hit)
+
+    def test_incremental_build_equals_full_build(self):
+        self.build()
+        self.write_dic('כלב\nחתול\n')
+        lexer, _ = self.build()
+        fresh = DictionaryCache(os.path.join(self.tmp.name, 'fresh'))
+        expected = Lexer()
+        with open(self.plugin_path, 'r') as file:
+            expected.load_plugin(json.loads(file.read()))
+        fresh.build(expected, ('Hebrew', 'project'),
+                    self.plugin_path, [self.dic_path])
+        self.assertEqual(expected.dic, lexer.dic)
+
+    def test_removed_dictionary_is_retracted(self):
+        self.build()
+        lexer = Lexer()
+        self.cache.build(lexer, ('Hebrew', 'project'), self.plugin_path, [])
+        self.assertEqual({}, lexer.dic)
+
+    def test_warm_lexer_swaps_project_dictionaries(self):
+        other_path = os.path.join(self.tmp.name, 'other.txt')
+        with open(other_path, 'w', encoding='utf-8') as file:
+            file.write('חתול\n')
+        lexer, _ = self.build()
+        hit = self.cache.build(lexer, ('Hebrew', 'other'), self.plugin_path,
+                               [self.dic_path, other_path])
+        self.assertFalse(hit)
+
+        expected = Lexer()
+        with open(self.plugin_path, 'r') as file:
+            expected.load_plugin(json.loads(file.read()))
+        fresh = DictionaryCache(os.path.join(self.tmp.name, 'fresh'))
+        fresh.build(expected, ('Hebrew', 'other'), self.plugin_path,
+                    [self.dic_path, other_path])
+        self.assertEqual(expected.dic, lexer.dic)
+
+        self.assertTrue(self.cache.build(lexer, ('Hebrew', 'other'),
+                                         self.plugin_path,
+                                         [self.dic_path, other_path]))
+
+    def new_lexer(self):
+        lexer = Lexer()
+        with open(self.plugin_path, 'r') as file:
+            lexer.load_plugin(json.loads(file.read()))
+        return lexer
+
+    def test_layered_build_shares_general_layer(self):
+        project_path = os.path.join(self.tmp.name, 'project.txt')
+        with open(project_path, 'w', encoding='utf-8') as file:
+            file.write('חתול\n')
+        base = self.new_lexer()
+        lexers = []
+        for project in ('first', 'second'):
+            lexer = self.new_lexer()
+            self.cache.build_layered(base, lexer, 'Hebrew', project,
+                                     self.plugin_path, [self.dic_path],
+                                     [project_path])
+            lexers.append(lexer)
+        for lexer in lexers:
+            self.assertIs(base, lexer.base)
+            self.assertNotIn('כלבים', lexer.dic)
+            self.assertEqual('expanded', lexer.lookup('כלבים'))
+            self.assertEqual('original', lexer.lookup('חתול'))
+        self.assertNotIn('חתול', base.dic)
+
+        # Generation is the same as of the merged dictionary
+        merged = self.new_lexer()
+        self.cache.build(merged, ('Hebrew', 'merged'), self.plugin_path,
+                         [self.dic_path, project_path])
+        self.assertEqual(merged.generation, lexers[0].generation)
+
+    def test_layered_build_is_a_hit(self):
+        project_path = os.path.join(self.tmp.name, 'project.txt')
+        with open(project_path, 'w', encoding='utf-8') as file:
+            file.write('חתול\n')
+        self.assertFalse(self.cache.build_layered(
+            self.new_lexer(), self.new_lexer(), 'Hebrew', 'project',
+            self.plugin_path, [self.dic_path], [project_path]))
+        self.assertTrue(self.cache.build_layered(
+            self.new_lexer(), self.new_lexer(), 'Hebrew', 'project',
+            self.plugin_path, [self.dic_path], [project_path]))
+
+    def test_analysis_copy_shares_frozen_dictionary(self):
+        lexer, _ = self.build()
+        # Only the mapped dictionary is kept
+        self.assertIsInstance(lexer.dic, FrozenDictionary)
+        self.assertEqual({}, lexer.expansions)
+        copy = lexer.copy_for_analysis()
+        self.assertIs(lexer.dic, copy.dic)
+        self.assertEqual(lexer.dic.path,
+                         pickle.loads(pickle.dumps(copy)).dic.path)
+
+        self.write_dic('כלב\nחתול\n')
+        path = lexer.dic.path
+        self.assertFalse(self.cache.build(lexer, ('Hebrew', 'project'),
+                                          self.plugin_path, [self.dic_path]))
+        self.assertIn('חתולים', lexer.dic)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(self.cache.build(lexer, ('Hebrew', 'project'),
+                                         self.plugin_path, [self.dic_path]))
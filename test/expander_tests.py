@@ -0,0 +1,66 @@
+import unittest
+import os
+import json
+import regex
+from lang.expander import Expander, _literals
+
+
+class LiteralsTests(unittest.TestCase):
+
+    def test_suffix(self):
+        self.assertEqual(('', 'ות'), _literals('ות$'))
+
+    def test_suffix_in_group(self):
+        self.assertEqual(('ה', 'נ'), _literals('(?P<beg>^ה.+)י(?P<end>נ$)'))
+
+    def test_prefix(self):
+        self.assertEqual(('ה', ''), _literals('^ה.+'))
+
+    def test_optional_prefix_letter(self):
+        self.assertEqual(('א', ''), _literals('^אב?'))
+
+    def test_char_class_is_not_literal(self):
+        self.assertEqual(('', ''), _literals('[^ןםךףץה]$'))
+
+    def test_alternative_is_not_literal(self):
+        self.assertEqual(('', ''), _literals('ה$|ות$'))
+
+    def test_escape_is_not_literal(self):
+        self.assertEqual(('', ''), _literals('\\w$'))
+
+
+class ExpanderTests(unittest.TestCase):
+
+    def sub_expand(self, patterns, word):
+        """ Expansion that tries every pattern and sub one by one. """
+        before_state = {word}
+        for level in sorted(patterns.keys()):
+            after_state = set()
+            for level_word in before_state:
+                for pattern, subs in patterns[level]:
+                    p = regex.compile(pattern)
+                    for sub in subs:
+                        if p.search(level_word):
+                            after_state.add(p.sub(sub, level_word))
+            before_state = after_state
+        return before_state
+
+    def assertSameForms(self, patterns, words):
+        expander = Expander()
+        expander.load(patterns)
+        for word in words:
+            self.assertEqual(self.sub_expand(patterns, word),
+                             expander.expand(word))
+
+    def test_hebrew_plugin(self):
+        plugin_name = os.path.join(os.getcwd(), 'plugins', 'Hebrew.json')
+        with open(plugin_name, "r") as file:
+            plugin = json.loads(file.read())
+        self.assertSameForms(plugin["pattern"], [
+            'כלב', 'יום', 'שכונה', 'עוגייה', 'התעטשות', 'יכתוב', 'הפעין',
+            'ה', 'י', 'ה\n'])
+
+    def test_several_matches(self):
+        self.assertSameForms({"0": [["a", ["\\g<0>x", "y"]],
+                                    ["b?", ["-"]]]},
+                             ['abab', 'aaa', 'b', ''])
@@ -0,0 +1,67 @@
+import unittest
+import os
+import pickle
+import tempfile
+from unittest import mock
+from lang.frozen import FrozenDictionary
+
+
+class FrozenDictionaryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dic = {'כלב': 'original', 'כלבים': 'expanded',
+                    'dog': 'original', 'dogs': 'expanded'}
+        self.frozen = FrozenDictionary(FrozenDictionary.pack(self.dic))
+
+    def test_same_lookups_as_dict(self):
+        for word, source in self.dic.items():
+            self.assertIn(word, self.frozen)
+            self.assertEqual(source, self.frozen[word])
+            self.assertEqual(source, self.frozen.get(word))
+        self.assertNotIn('חתול', self.frozen)
+        self.assertIsNone(self.frozen.get('חתול'))
+        self.assertNotIn('do', self.frozen)
+        with self.assertRaises(KeyError):
+            self.frozen['חתול']
+
+    def test_equals_dict(self):
+        self.assertEqual(self.dic, self.frozen)
+        self.assertNotEqual({'dog': 'original'}, self.frozen)
+
+    def test_items_are_sorted(self):
+        self.assertEqual(len(self.dic), len(self.frozen))
+        self.assertEqual(sorted(self.dic.items()), list(self.frozen.items()))
+        self.assertEqual(sorted(self.dic), list(self.frozen))
+
+    def test_empty_dictionary(self):
+        frozen = FrozenDictionary(FrozenDictionary.pack({}))
+        self.assertEqual(0, len(frozen))
+        self.assertNotIn('dog', frozen)
+
+    def test_wrong_buffer_is_refused(self):
+        with self.assertRaises(ValueError):
+            FrozenDictionary(bytes(16))
+
+    def test_mapped_dictionary_is_pickled_as_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'dic.frozen')
+            frozen = FrozenDictionary.freeze(self.dic, path)
+            data = pickle.dumps(frozen)
+            self.assertNotIn('dogs'.encode('utf-8'), data)
+            copy = pickle.loads(data)
+            self.assertEqual(path, copy.path)
+            self.assertEqual(dict(frozen.items()), dict(copy.items()))
+            self.assertEqual(['dic.frozen'], os.listdir(tmp))
+            del frozen, copy
+
+    def test_memo_is_bounded(self):
+        with mock.patch('lang.frozen.MEMO_SIZE', 2):
+            for word in ['כלב', 'חתול', 'dog', 'cat']:
+                self.frozen.get(word)
+                self.assertLessEqual(len(self.frozen.memo), 2)
+        self.assertEqual('original', self.frozen.get('dog'))
+        self.assertNotIn('cat', self.frozen)
+
+    def test_unmapped_dictionary_is_pickled_as_buffer(self):
+        copy = pickle.loads(pickle.dumps(self.frozen))
+        self.assertEqual(sorted(self.dic.items()), list(copy.items()))
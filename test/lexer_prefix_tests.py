@@ -37,6 +37,27 @@ class Test:
             self.assertEqual(expected, result)
 
 
+class TestNotPrefix(unittest.TestCase):
+
+    def setUp(self):
+        self.lexer = Lexer()
+        plugin_name = os.path.join(os.getcwd(), 'plugins', 'Hebrew.json')
+        with open(plugin_name, "r") as file:
+            plugin = json.loads(file.read())
+        self.lexer.load_plugin(plugin)
+        self.lexer.dic['כלב'] = 'original'
+
+    def test_unknown_prefix(self):
+        result, *_ = self.lexer.analyze(PseudoFile('זכלב'))
+        self.assertEqual([('זכלב', {'class': 'unknown', 'type': 'word'})],
+                         result)
+
+    def test_prefix_only(self):
+        result, *_ = self.lexer.analyze(PseudoFile('וכש'))
+        self.assertEqual([('וכש', {'class': 'unknown', 'type': 'word'})],
+                         result)
+
+
 class TestL(Test.PrefixTest):
 
     def setUp(self):
@@ -0,0 +1,89 @@
+import unittest
+import os
+import json
+import io
+from lang.lexer import Lexer
+
+
+class LexerSourcesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.lexer = Lexer()
+        plugin_name = os.path.join(os.getcwd(), 'plugins', 'Hebrew.json')
+        with open(plugin_name, "r") as file:
+            plugin = json.loads(file.read())
+        self.lexer.load_plugin(plugin)
+
+    def load(self, content, source):
+        self.lexer.load_dictionary(io.StringIO(content), source)
+        self.lexer.expand_dic()
+
+    def test_unload_retracts_forms(self):
+        self.load('כלב', 'a')
+        self.load('חתול', 'b')
+        self.lexer.unload_dictionary('b')
+        self.assertNotIn('חתול', self.lexer.dic)
+        self.assertNotIn('חתולים', self.lexer.dic)
+        self.assertIn('כלבים', self.lexer.dic)
+
+    def test_shared_word_survives_unload(self):
+        self.load('כלב', 'a')
+        self.load('כלב', 'b')
+        self.lexer.unload_dictionary('b')
+        self.assertEqual('original', self.lexer.dic['כלב'])
+        self.assertIn('כלבים', self.lexer.dic)
+
+    def test_unloaded_original_stays_as_form(self):
+        self.load('כלב', 'a')
+        self.load('כלבים', 'b')
+        self.assertEqual('original', self.lexer.dic['כלבים'])
+        self.lexer.unload_dictionary('b')
+        self.assertEqual('expanded', self.lexer.dic['כלבים'])
+
+    def test_incremental_equals_full_expansion(self):
+        self.load('כלב', 'a')
+        self.load('שכונה', 'b')
+        full = Lexer()
+        full.expander = self.lexer.expander
+        full.load_dictionary(io.StringIO('כלב'))
+        full.load_dictionary(io.StringIO('שכונה'))
+        full.expand_dic()
+        self.assertEqual(full.dic, self.lexer.dic)
+
+    def test_dictionary_keeps_words_only(self):
+        self.lexer.load_dictionary(io.StringIO('כלב, חתול\n'))
+        self.assertEqual({'כלב': 'original', 'חתול': 'original'},
+                         self.lexer.dic)
+
+    def test_stream_equals_analyze(self):
+        self.load('כלב', 'a')
+        text = 'הכלב של כלבים, וחתול!\n' * 3
+        expected = self.lexer.analyze(io.StringIO(text))
+        expected = (expected[0], dict(expected[1])) + expected[2:]
+        tokens = list(self.lexer.analyze_stream(io.StringIO(text), 5))
+        dic_unknown, *counters = self.lexer.counters()
+        # Non-letters might be split at the chunk boundary
+        self.assertEqual(text, "".join(word for word, _ in tokens))
+        words = [token for token in tokens if token[1]["type"] == "word"]
+        self.assertEqual(([token for token in expected[0]
+                           if token[1]["type"] == "word"], ) + expected[1:],
+                         (words, dict(dic_unknown), *counters))
+
+    def test_layered_equals_merged_analysis(self):
+        self.load('כלב', 'a')
+        overlay = Lexer()
+        overlay.expander = self.lexer.expander
+        overlay.prefixes = self.lexer.prefixes
+        overlay.prefix_trie = self.lexer.prefix_trie
+        overlay.base = self.lexer
+        overlay.load_dictionary(io.StringIO('חתול כלבים'), 'b')
+        overlay.expand_dic()
+        self.assertEqual('original', overlay.lookup('כלבים'))
+        self.assertEqual('expanded', self.lexer.lookup('כלבים'))
+
+        self.load('חתול כלבים', 'b')
+        text = 'הכלב של כלבים, וחתולים!\n'
+        self.assertEqual(self.lexer.analyze(io.StringIO(text))[2:],
+                         overlay.analyze(io.StringIO(text))[2:])
+        copy = overlay.copy_for_analysis()
+        self.assertIs(self.lexer.dic, copy.base.dic)
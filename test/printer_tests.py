@@ -0,0 +1,35 @@
+import unittest
+import io
+from lang import printer
+
+
+class PrinterTests(unittest.TestCase):
+
+    def test_paragraphs(self):
+        tokens = [('x', {'type': 'word', 'class': 'known'}),
+                  (' y\n\nz', {'type': 'non_word'})]
+        page = printer.print_page('a<b', tokens, style='p {}')
+        self.assertEqual(
+            '<!DOCTYPE html><html><meta charset="utf-8" />'
+            '<title>a&lt;b</title><body><article>'
+            '<p><span class=known>x</span> y</p><p></p><p>z</p>'
+            '</article><style>p {}</style></body></html>', page)
+
+    def test_style_is_escaped(self):
+        page = printer.print_page('a', [], style='p{a>b}&')
+        self.assertEqual(
+            '<!DOCTYPE html><html><meta charset="utf-8" /><title>a</title>'
+            '<body><article><p></p></article><style>p{a&gt;b}&amp;</style>'
+            '</body></html>', page)
+
+    def test_default_style(self):
+        page = printer.print_page('a', [])
+        self.assertIn('<style>' + printer.DEFAULT_STYLE + '</style>', page)
+
+    def test_write_page_consumes_iterator(self):
+        tokens = iter([('x', {'type': 'word', 'class': 'maybe'}),
+                       ('\n', {'type': 'non_word'})])
+        out = io.StringIO()
+        printer.write_page(out, 'a', tokens)
+        self.assertIn('<p><span class=maybe>x</span></p><p></p>',
+                      out.getvalue())
@@ -0,0 +1,29 @@
+import unittest
+from lang.lexer import Lexer
+from lang.registry import LexerRegistry
+
+
+class RegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = LexerRegistry()
+        self.lexer = Lexer()
+
+    def test_lexer_is_lent_once(self):
+        lexer, version = self.registry.lend('Hebrew')
+        self.assertIsNone(lexer)
+        self.registry.give_back('Hebrew', self.lexer, version)
+        self.assertIs(self.lexer, self.registry.lend('Hebrew')[0])
+        self.assertIsNone(self.registry.lend('Hebrew')[0])
+
+    def test_outdated_lexer_is_not_taken_back(self):
+        _, version = self.registry.lend('Hebrew')
+        self.registry.invalidate('Hebrew')
+        self.registry.give_back('Hebrew', self.lexer, version)
+        self.assertIsNone(self.registry.lend('Hebrew')[0])
+
+    def test_languages_are_separate(self):
+        _, version = self.registry.lend('Hebrew')
+        self.registry.give_back('Hebrew', self.lexer, version)
+        self.registry.invalidate('Arabic')
+        self.assertIs(self.lexer, self.registry.lend('Hebrew')[0])
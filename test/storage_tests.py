@@ -0,0 +1,280 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+from storage import Storage, MIGRATIONS
+
+
+class MigrationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'lt.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def indexes(self, storage):
+        storage.db_cursor.execute("""SELECT name FROM sqlite_master
+        WHERE type='index'""")
+        return {row[0] for row in storage.db_cursor.fetchall()}
+
+    def test_new_db_has_latest_version(self):
+        storage = Storage(self.db_path)
+        storage.db_cursor.execute("PRAGMA user_version")
+        self.assertEqual(len(MIGRATIONS), storage.db_cursor.fetchone()[0])
+        self.assertIn('WordsByWord', self.indexes(storage))
+        storage.db_conn.close()
+
+    def test_legacy_db_is_upgraded_in_place(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE Languages(lang TEXT, directory TEXT)")
+        conn.execute("""CREATE TABLE Files(name TEXT, lang TEXT,
+        project TEXT, size INTEGER, known INTEGER, pknown REAL,
+        maybe INTEGER, pmaybe REAL, unknown INTEGER, punknown REAL)""")
+        conn.execute("""CREATE TABLE Words(word TEXT, lang TEXT,
+        project TEXT, file TEXT, quantity INTEGER)""")
+        conn.executemany("""INSERT INTO Files
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                         [('f', 'he', 'p', 5, 2, 0.4, 0, 0.0, 3, 0.6),
+                          ('g', 'he', 'p', 2, 1, 0.5, 0, 0.0, 1, 0.5)])
+        conn.executemany("INSERT INTO Words VALUES(?, ?, ?, ?, ?)",
+                         [('a', 'he', 'p', 'f', 2), ('a', 'he', 'p', 'f', 2),
+                          ('b', 'he', 'p', 'f', 1), ('a', 'he', 'p', 'g', 1),
+                          ('c', 'he', 'p', 'gone', 7)])
+        conn.commit()
+        conn.close()
+
+        storage = Storage(self.db_path)
+        self.assertEqual([('a', 2), ('b', 1)],
+                         storage.get_unknown_words_for_file('he', 'p', 'f'))
+        self.assertEqual([('a', 3), ('b', 1)],
+                         storage.get_unknown_words('he', 'p'))
+        self.assertEqual(['f', 'g'], [row[0] for row in
+                                      storage.get_files_stats('he', 'p', '')])
+        self.assertEqual(['p'], storage.get_projects('he'))
+        self.assertIn('WordsByWord', self.indexes(storage))
+        storage.db_conn.close()
+
+    def test_legacy_db_is_vacuumed(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""CREATE TABLE Words(word TEXT, lang TEXT,
+        project TEXT, file TEXT, quantity INTEGER)""")
+        conn.executemany("INSERT INTO Words VALUES(?, ?, ?, ?, ?)",
+                         [('w{0}'.format(i), 'he', 'p', 'gone', 1)
+                          for i in range(5000)])
+        conn.commit()
+        conn.close()
+
+        storage = Storage(self.db_path)
+        storage.db_cursor.execute("PRAGMA freelist_count")
+        self.assertEqual(0, storage.db_cursor.fetchone()[0])
+        storage.db_conn.close()
+
+    def test_failed_migration_is_rolled_back(self):
+        failing = MIGRATIONS + [["CREATE TABLE Extra(x)",
+                                 "INSERT INTO Missing VALUES(1)"]]
+        with mock.patch('storage.MIGRATIONS', failing):
+            with self.assertRaises(sqlite3.OperationalError):
+                Storage(self.db_path)
+        storage = Storage(self.db_path)
+        storage.db_cursor.execute("""SELECT name FROM sqlite_master
+        WHERE name='Extra'""")
+        self.assertIsNone(storage.db_cursor.fetchone())
+        storage.db_conn.close()
+
+    def test_reopen_keeps_data(self):
+        storage = Storage(self.db_path)
+        storage.add_language('he', 'folder')
+        storage.db_conn.close()
+        storage = Storage(self.db_path)
+        self.assertEqual([('he', 'folder')], storage.get_languages())
+        storage.db_conn.close()
+
+
+class TransactionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = Storage(os.path.join(self.tmp.name, 'lt.db'))
+
+    def tearDown(self):
+        self.storage.db_conn.close()
+        self.tmp.cleanup()
+
+    def test_nested_changes_are_committed_once(self):
+        with self.storage.transaction(bulk=True):
+            self.storage.add_language('he', 'folder')
+            self.assertTrue(self.storage.db_conn.in_transaction)
+            self.storage.update_stat(0, 'he', 'p', 'f', 1, 0, 0)
+            self.storage.batch_update_stats()
+            self.storage.update_words('he', 'p', 'f', {'a': 1})
+            self.storage.batch_update_words()
+            self.assertTrue(self.storage.db_conn.in_transaction)
+        self.assertFalse(self.storage.db_conn.in_transaction)
+        self.assertEqual([('a', 1)],
+                         self.storage.get_unknown_words('he', 'p'))
+
+    def test_failed_transaction_is_rolled_back(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.storage.transaction():
+                self.storage.add_language('he', 'folder')
+                1 / 0
+        self.assertEqual([], self.storage.get_languages())
+
+    def test_failed_schema_change_is_rolled_back(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.storage.transaction():
+                self.storage.db_cursor.execute("CREATE TABLE Extra(x)")
+                1 / 0
+        self.storage.db_cursor.execute("""SELECT name FROM sqlite_master
+        WHERE name='Extra'""")
+        self.assertIsNone(self.storage.db_cursor.fetchone())
+
+    def test_bulk_restores_synchronous(self):
+        self.storage.db_cursor.execute("PRAGMA synchronous")
+        before = self.storage.db_cursor.fetchone()[0]
+        with self.storage.transaction(bulk=True):
+            self.storage.add_language('he', 'folder')
+        self.storage.db_cursor.execute("PRAGMA synchronous")
+        self.assertEqual(before, self.storage.db_cursor.fetchone()[0])
+        self.storage.db_cursor.execute("PRAGMA journal_mode")
+        self.assertEqual('wal', self.storage.db_cursor.fetchone()[0])
+
+
+class StatsIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = Storage(os.path.join(self.tmp.name, 'lt.db'))
+        self.storage.update_stat(0, 'he', 'p', 'a.txt', 10, 5, 2)
+        self.storage.update_stat(0, 'he', 'p', 'b.txt', 4, 1, 1)
+        self.storage.update_stat(0, 'he', 'other', 'a.txt', 1, 1, 0)
+        self.storage.batch_update_stats()
+
+    def tearDown(self):
+        self.storage.db_conn.close()
+        self.tmp.cleanup()
+
+    def test_index_agrees_with_stat_changed(self):
+        index = self.storage.get_stats_index('he', 'p')
+        for args in [('a.txt', 10, 5, 2), ('a.txt', 10, 6, 2),
+                     ('b.txt', 4, 1, 1), ('c.txt', 1, 0, 0)]:
+            self.assertEqual(
+                self.storage.stat_changed('he', 'p', *args),
+                index.changed(*args))
+        self.assertEqual(-1, index.changed('a.txt', 10, 5, 2))
+        self.assertEqual(0, index.changed('c.txt', 1, 0, 0))
+
+
+class WordsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = Storage(os.path.join(self.tmp.name, 'lt.db'))
+        for file, words in [('a.txt', {'x': 3, 'y': 1}),
+                            ('b.txt', {'x': 1, 'z': 2})]:
+            self.storage.update_stat(0, 'he', 'p', file, 10, 5, 0)
+            self.storage.update_words('he', 'p', file, words)
+        self.storage.batch_update_stats()
+        self.storage.batch_update_words()
+
+    def tearDown(self):
+        self.storage.db_conn.close()
+        self.tmp.cleanup()
+
+    def test_words_of_project(self):
+        self.assertEqual([('x', 4), ('z', 2), ('y', 1)],
+                         self.storage.get_unknown_words('he', 'p'))
+
+    def test_words_of_removed_file_are_dropped(self):
+        self.storage.update_stat(0, 'he', 'p', 'c.txt', 10, 5, 0)
+        self.storage.batch_update_stats()
+        self.storage.update_words('he', 'p', 'c.txt', {'w': 1})
+        self.storage.update_words('he', 'p', 'a.txt', {'x': 3})
+        self.storage.remove_file('c.txt', 'he', 'p')
+        self.storage.batch_update_words()
+        self.assertEqual([], self.storage.words)
+        self.assertEqual([('x', 4), ('z', 2)],
+                         self.storage.get_unknown_words('he', 'p'))
+
+    def test_failed_batch_is_dropped(self):
+        self.storage.update_words('he', 'p', 'a.txt', {'x': 3})
+        with mock.patch.object(self.storage, 'db_cursor') as cursor:
+            cursor.execute.side_effect = sqlite3.OperationalError
+            with self.assertRaises(sqlite3.OperationalError):
+                self.storage.batch_update_words()
+        self.assertEqual([], self.storage.words)
+
+    def test_words_of_file(self):
+        self.assertEqual([('x', 3), ('y', 1)],
+                         self.storage.get_unknown_words_for_file(
+                             'he', 'p', 'a.txt'))
+
+    def filter(self, pattern):
+        return sorted(row[0] for row in
+                      self.storage.get_files_stats('he', 'p', pattern))
+
+    def test_files_filter(self):
+        self.assertEqual(['b.txt'], self.filter('z'))
+        self.assertEqual(['a.txt', 'b.txt'], self.filter('X'))
+
+    def test_files_filter_patterns(self):
+        self.storage.update_stat(0, 'he', 'p', 'c.txt', 10, 5, 0)
+        self.storage.update_words('he', 'p', 'c.txt', {'שלום': 1})
+        self.storage.update_stat(0, 'he', 'p', 'd.txt', 10, 5, 0)
+        self.storage.update_words('he', 'p', 'd.txt', {'משלוח': 1})
+        self.storage.batch_update_stats()
+        self.storage.batch_update_words()
+        self.assertEqual(['c.txt'], self.filter('של%'))
+        self.assertEqual(['c.txt'], self.filter('שלום'))
+        self.assertEqual(['c.txt', 'd.txt'], self.filter('%שלו%'))
+        self.assertEqual(['d.txt'], self.filter('מ_לו%'))
+        self.assertEqual([], self.filter('שלו'))
+
+    def test_removed_project_leaves_no_words(self):
+        self.storage.remove_project('he', 'p')
+        self.assertEqual([], self.storage.get_unknown_words('he', 'p'))
+        self.assertEqual([], self.storage.get_projects('he'))
+        self.storage.db_cursor.execute("SELECT COUNT(*) FROM Vocabulary")
+        self.assertEqual(0, self.storage.db_cursor.fetchone()[0])
+
+    def test_project_words_follow_file_changes(self):
+        self.storage.update_words('he', 'p', 'a.txt', {'z': 5})
+        self.storage.batch_update_words()
+        self.assertEqual([('z', 7), ('x', 1)],
+                         self.storage.get_unknown_words('he', 'p'))
+        self.storage.remove_file('b.txt', 'he', 'p')
+        self.assertEqual([('z', 5)],
+                         self.storage.get_unknown_words('he', 'p'))
+
+    def test_only_difference_is_written(self):
+        changes = self.storage.db_conn.total_changes
+        self.storage.update_words('he', 'p', 'a.txt', {'x': 3, 'y': 1})
+        self.storage.batch_update_words()
+        self.assertEqual(changes, self.storage.db_conn.total_changes)
+
+        self.storage.update_words('he', 'p', 'a.txt', {'x': 2, 'w': 1})
+        self.storage.batch_update_words()
+        self.assertEqual([('x', 2), ('w', 1)],
+                         self.storage.get_unknown_words_for_file(
+                             'he', 'p', 'a.txt'))
+        self.assertEqual([('x', 3), ('z', 2), ('w', 1)],
+                         self.storage.get_unknown_words('he', 'p'))
+
+    def test_pages_follow_each_other(self):
+        for column in (0, 1):
+            rows = []
+            page = self.storage.get_unknown_words_page(
+                'he', 'p', None, column, True, None, 2)
+            while page:
+                rows += page
+                page = self.storage.get_unknown_words_page(
+                    'he', 'p', None, column, True, page[-1], 2)
+            self.assertEqual(sorted(self.storage.get_unknown_words('he', 'p')),
+                             sorted((word, sum) for word, sum, _ in rows))
+        page = self.storage.get_unknown_words_page(
+            'he', 'p', 'a.txt', 0, False, None, 3)
+        self.assertEqual([('x', 3), ('y', 1)],
+                         [(word, quantity) for word, quantity, _ in page])
@@ -1,4 +1,5 @@
 import unittest
+import io
 from lang import tokenizer
 
 
@@ -88,3 +89,70 @@ class TokenizerTests(unittest.TestCase):
             (' ', {'type': 'non_word'}),
             ('אבא', {'type': 'word'}),
             ('!\r\n', {'type': 'non_word'})])
+
+    def test_spans(self):
+        content = "אבא אמא!"
+        tknzr = tokenizer.Tokenizer(content)
+        result = [w for w in tknzr.spans()]
+        self.assertEqual(result, [
+            (0, 3, 'word'),
+            (3, 4, 'non_word'),
+            (4, 7, 'word'),
+            (7, 8, 'non_word')])
+
+    def test_spans_of_empty_string(self):
+        tknzr = tokenizer.Tokenizer("")
+        self.assertEqual([w for w in tknzr.spans()], [])
+
+    def test_spans_match_tokens(self):
+        content = "'א'בא' צ״ק, אבא!\r\n"
+        tknzr = tokenizer.Tokenizer(content)
+        spans = [(content[start:end], {'type': kind})
+                 for start, end, kind in tknzr.spans()]
+        self.assertEqual(spans, [w for w in tknzr])
+
+
+class StreamTokenizerTests(unittest.TestCase):
+
+    def merged(self, tokens):
+        # Run of non-letters might be split at the chunk boundary
+        result = []
+        for text, description in tokens:
+            if result and description["type"] == "non_word" and \
+                    result[-1][1]["type"] == "non_word":
+                result[-1] = (result[-1][0] + text, description)
+            else:
+                result.append((text, description))
+        return result
+
+    def assertSameTokens(self, content):
+        expected = [w for w in tokenizer.Tokenizer(content)]
+        for chunk_size in range(1, len(content) + 2):
+            stream = io.StringIO(content)
+            result = [w for w in tokenizer.StreamTokenizer(stream, chunk_size)]
+            self.assertEqual(expected, self.merged(result))
+
+    def test_words_across_chunks(self):
+        self.assertSameTokens("אבא אמא!\r\n")
+
+    def test_quotes_across_chunks(self):
+        self.assertSameTokens("'א'בא' אב\"א צ״ק.")
+
+    def test_leading_and_trailing_non_words(self):
+        self.assertSameTokens("  ...אבא...  ")
+
+    def test_no_words(self):
+        self.assertSameTokens(" .,! ")
+
+    def test_quote_at_chunk_end(self):
+        self.assertSameTokens("אב'א אב' א")
+
+    def test_non_words_are_not_held(self):
+        content = ". " * 1000 + "אבא"
+        stream = io.StringIO(content)
+        result = [w for w in tokenizer.StreamTokenizer(stream, 10)]
+        self.assertTrue(all(len(text) <= 10 for text, _ in result[:-1]))
+        self.assertEqual(content, "".join(text for text, _ in result))
+
+    def test_empty(self):
+        self.assertSameTokens("")
@@ -104,6 +104,10 @@ class Ui_MainWindow(object):
         self.actionAbout.setObjectName("actionAbout")
         self.actionManage = QtWidgets.QAction(MainWindow)
         self.actionManage.setObjectName("actionManage")
+        self.actionAutoAnalysis = QtWidgets.QAction(MainWindow)
+        self.actionAutoAnalysis.setCheckable(True)
+        self.actionAutoAnalysis.setObjectName("actionAutoAnalysis")
+        self.menuFil.addAction(self.actionAutoAnalysis)
         self.menuFil.addAction(self.actionExit)
         self.menuLanguages.addAction(self.actionManage)
         self.menuHelp.addAction(self.actionAbout)
@@ -133,4 +137,5 @@ class Ui_MainWindow(object):
         self.actionExit.setText(_translate("MainWindow", "Exit"))
         self.actionAbout.setText(_translate("MainWindow", "About"))
         self.actionManage.setText(_translate("MainWindow", "Manage"))
+        self.actionAutoAnalysis.setText(_translate("MainWindow", "Auto analysis"))
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import os
+import logging
+from multiprocessing import TimeoutError
+
+import config
+from lang.lexer import Lexer
+from lang.analyzer import Analyzer, analyze_file
+from lang.cache import file_digest
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class ProjectWorker(QThread):
+    """
+    Builds the lexer and analyzes project files in the background.
+    Results are sent to GUI thread with signals, the worker never touches
+    the storage.
+    """
+
+    progressChanged = pyqtSignal(int)
+    # file name, dic_unknown, text_size, known, maybe
+    fileAnalyzed = pyqtSignal(str, object, object, int, int)
+    # file name, mtime, size, digest, generation
+    fingerprintChanged = pyqtSignal(str, float, int, str, str)
+
+    def __init__(self, cache, language, project, plugin, plugin_path,
+                 dic_paths, general_paths, files, css, fingerprints,
+                 base=None):
+        """
+        :param cache: DictionaryCache
+        :param language:
+        :param project:
+        :param plugin: loaded plugin
+        :param plugin_path:
+        :param dic_paths: paths of the project dictionaries
+        :param general_paths: paths of the general dictionaries
+        :param files: list of (file name, file path, output path)
+        :param css:
+        :param fingerprints: dict name -> (mtime, size, digest, generation)
+        :param base: warm lexer of the general dictionaries of the language,
+        project dictionaries are layered on top of it; new one is built if
+        it's not given or it has been built with other plugin
+        """
+        super(ProjectWorker, self).__init__()
+        self.cache = cache
+        self.language = language
+        self.project = project
+        self.plugin = plugin
+        self.plugin_path = plugin_path
+        self.dic_paths = dic_paths
+        self.general_paths = general_paths
+        self.files = files
+        self.out_paths = {file: out_path for file, _, out_path in files}
+        self.css = css
+        self.fingerprints = fingerprints
+        self.base = base
+        self.canceled = False
+
+    def cancel(self):
+        """
+        Stops the analysis, the files being analyzed are abandoned.
+        """
+        self.canceled = True
+
+    def run(self):
+        try:
+            self.analyze()
+        except Exception as e:
+            logging.exception(e)
+
+    def unchanged(self, file, file_path, out_path, stat, generation):
+        """
+        Checks if the file and the dictionaries are the same as they were
+        when the output of the file has been made.
+        """
+        fingerprint = self.fingerprints.get(file)
+        if not fingerprint or not os.path.exists(out_path):
+            return False
+
+        mtime, size, digest, old_generation = fingerprint
+        if old_generation != generation or size != stat.st_size:
+            return False
+        if mtime == stat.st_mtime:
+            return True
+
+        # File has been touched, see if the content has changed
+        if file_digest(file_path) == digest:
+            self.fingerprintChanged.emit(
+                file, stat.st_mtime, size, digest, generation)
+            return True
+        return False
+
+    def report(self, result, stats, generation):
+        """
+        Sends the result of file analysis to GUI thread.
+        """
+        file, dic_unknown, text_size, known, maybe, digest = result
+        self.fileAnalyzed.emit(file, dic_unknown, text_size, known, maybe)
+        if text_size is not None:  # Analysis was successful
+            stat = stats[file]
+            self.fingerprintChanged.emit(file, stat.st_mtime, stat.st_size,
+                                         digest, generation)
+
+    def analyze(self):
+        # Build lexer for current project on top of the general one
+        base, self.base = self.base, None
+        if base is None or \
+                base.plugin_key != self.cache.plugin_key(self.plugin_path):
+            base = Lexer()
+            base.load_plugin(self.plugin)
+        lexer = Lexer()
+        lexer.load_plugin(self.plugin)
+        self.progressChanged.emit(1000)
+
+        self.cache.build_layered(base, lexer, self.language, self.project,
+                                 self.plugin_path, self.general_paths,
+                                 self.dic_paths)
+        # General lexer is given away only if it's built completely
+        self.base = base
+
+        # Test flatten dictionary feature
+        # with open('flat_dic.txt', 'w') as flat_dic:
+        #     for word in  sorted(lexer.dic.keys()):
+        #         flat_dic.write('{}\n'.format(word))
+
+        self.progressChanged.emit(3000)
+        if self.canceled:
+            return
+
+        # Skip the files that haven't changed since the last run
+        stats = {}
+        tasks = []
+        for file, file_path, out_path in self.files:
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                logging.exception(e)
+                continue
+            if self.unchanged(file, file_path, out_path, stat,
+                              lexer.generation):
+                logging.info("Skip unchanged file:" + file_path)
+                continue
+            stats[file] = stat
+            tasks.append(
+                (file, file_path, out_path + config.tmp_ext, self.css))
+
+        step = 7000 / len(self.files)
+        done = len(self.files) - len(tasks)
+        self.progressChanged.emit(3000 + int(step * done))
+        if not tasks:
+            return
+
+        if len(tasks) < config.pool_min_files:
+            # Starting the pool costs more than analysis of few files
+            for task in tasks:
+                result = analyze_file(lexer, task, lambda: self.canceled)
+                if self.canceled:
+                    return
+                self.report(result, stats, lexer.generation)
+                done += 1
+                self.progressChanged.emit(3000 + int(step * done))
+            return
+
+        # Analyze project files
+        analyzer = Analyzer(lexer)
+        results = analyzer.imap(tasks)
+        while done < len(self.files):
+            if self.canceled:
+                analyzer.terminate()
+                return
+            try:
+                result = results.next(0.1)
+            except TimeoutError:  # Look at cancel flag once in a while
+                continue
+            except StopIteration:
+                break
+            done += 1
+            self.report(result, stats, lexer.generation)
+            self.progressChanged.emit(3000 + int(step * done))
+        analyzer.close()